@@ -0,0 +1,228 @@
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+from phone_index import phone_digits, prefix_digits
+
+# поля запиту; phone - синонім phones
+QUERY_FIELDS = ('name', 'phones', 'email', 'birthday', 'note')
+FIELD_ALIASES = {'phone': 'phones'}
+# = - точне значення, ^ - починається з, ~ - містить
+OPERATORS = {'=': 'exact', '^': 'prefix', '~': 'contains'}
+QUERY_LIMIT = 100
+# 380 і перша цифра коду оператора є майже в кожному номері
+PHONE_COMMON_DIGITS = 4
+
+TOKEN = re.compile(r'\s*(?:(?P<paren>[()])|(?P<field>[A-Za-z]+)\s*(?P<op>[=^~])\s*(?P<value>"[^"]*"|[^\s()]*)'
+                   r'|(?P<word>[^\s()]+))')
+
+
+class QueryError(ValueError):
+    pass
+
+
+def search_key(value):
+    return str(value).lower().replace(' ', '')
+
+
+def birthday_key(value):
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.isoformat() if isinstance(value, date) else search_key(value)
+
+
+def account_keys(account):
+    # нормалізовані значення полів рахунку; рахуються при індексації, а не при кожному запиті
+    birthday = account.get('birthday')
+    return {'name': (search_key(account['name']),),
+            'phones': tuple({phone_digits(phone) for phone in account.get('phones') or () if phone}),
+            'email': (search_key(account.get('email') or ''),),
+            'birthday': (birthday_key(birthday),) if birthday else (),
+            'note': (search_key(account.get('note') or ''),)}
+
+
+class Term:
+    def __init__(self, field, op, value):
+        self.field = field
+        self.op = op
+        if field == 'phones':
+            # як і в дереві номерів: 067... - це +38067...
+            value = phone_digits(value) if op == 'contains' else prefix_digits(value)
+        elif field == 'birthday':
+            value = value.strip()
+        else:
+            value = search_key(value)
+        if not value:
+            raise QueryError(f'Empty value for {field}')
+        self.value = value
+
+    def compile(self):
+        field, value = self.field, self.value
+        if self.op == 'exact':
+            return lambda keys: value in keys[field]
+        if self.op == 'prefix':
+            return lambda keys: any(key.startswith(value) for key in keys[field])
+        return lambda keys: any(value in key for key in keys[field])
+
+    def plan(self, book):
+        # (оцінка кількості кандидатів, функція, що повертає їхні імена) або None, якщо індексу немає
+        if self.field == 'phones':
+            phones = book.phone_index
+            if self.op == 'exact':
+                return len(phones.prefixes.exact(self.value)), lambda: phones.prefixes.exact(self.value)
+            if self.op == 'prefix':
+                # кожна цифра після коду країни та оператора ділить номери приблизно на 10
+                return len(phones) / 10 ** max(len(self.value) - PHONE_COMMON_DIGITS, 0), \
+                    lambda: phones.prefixes.collect(self.value)
+            return None
+        if self.field == 'birthday' and self.op == 'exact':
+            try:
+                day = date.fromisoformat(self.value)
+            except ValueError:
+                return None
+            # індекс знає лише місяць і день, рік перевірить предикат
+            return len(book.birthday_index) / 365, \
+                lambda: {name for name, _ in book.birthday_index.between(day, day + timedelta(days=1))}
+        index = book.field_indexes.get(self.field)
+        if index is None:
+            return None
+        if self.op == 'exact':
+            return index.estimate(self.value), lambda: set(index.get(self.value))
+        if self.op == 'prefix' and hasattr(index, 'prefix'):
+            return index.estimate_prefix(self.value), lambda: set(index.prefix(self.value))
+        return None
+
+
+class And:
+    def __init__(self, parts):
+        self.parts = parts
+
+    def compile(self):
+        predicates = [part.compile() for part in self.parts]
+        return lambda keys: all(predicate(keys) for predicate in predicates)
+
+    def plan(self, book):
+        # достатньо найвибірковішого індексу, решту умов перевірить предикат
+        plans = [plan for plan in (part.plan(book) for part in self.parts) if plan is not None]
+        return min(plans, key=lambda plan: plan[0]) if plans else None
+
+
+class Or:
+    def __init__(self, parts):
+        self.parts = parts
+
+    def compile(self):
+        predicates = [part.compile() for part in self.parts]
+        return lambda keys: any(predicate(keys) for predicate in predicates)
+
+    def plan(self, book):
+        # індекс можна взяти, лише якщо він є для кожної гілки
+        plans = [part.plan(book) for part in self.parts]
+        if any(plan is None for plan in plans):
+            return None
+        return sum(plan[0] for plan in plans), lambda: set().union(*(candidates() for _, candidates in plans))
+
+
+class Not:
+    def __init__(self, part):
+        self.part = part
+
+    def compile(self):
+        predicate = self.part.compile()
+        return lambda keys: not predicate(keys)
+
+    def plan(self, book):
+        return None
+
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN.match(text, position)
+        position = match.end()
+        if match['paren']:
+            tokens.append(match['paren'])
+        elif match['field']:
+            field = FIELD_ALIASES.get(match['field'].lower(), match['field'].lower())
+            if field not in QUERY_FIELDS:
+                raise QueryError(f'Unknown field: {match["field"]}')
+            value = match['value']
+            if value.startswith('"'):
+                # лапки без пари: значення в лапках регулярний вираз не знайшов і взяв слово разом з лапкою
+                if len(value) < 2 or not value.endswith('"'):
+                    raise QueryError(f'Unbalanced quotes in {match["field"]} value: {value}')
+                value = value[1:-1]
+            tokens.append(Term(field, OPERATORS[match['op']], value))
+        elif match['word'].upper() in ('AND', 'OR', 'NOT'):
+            tokens.append(match['word'].upper())
+        else:
+            raise QueryError(f'Unexpected {match["word"]!r}, expected field=value, field^value or field~value')
+    return tokens
+
+
+class Parser:
+    # or := and (OR and)*; and := not ([AND] not)*; not := NOT not | (or) | умова
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def parse(self):
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise QueryError(f'Unexpected {self.peek()!r}')
+        return node
+
+    def parse_or(self):
+        parts = [self.parse_and()]
+        while self.peek() == 'OR':
+            self.take()
+            parts.append(self.parse_and())
+        return parts[0] if len(parts) == 1 else Or(parts)
+
+    def parse_and(self):
+        parts = [self.parse_not()]
+        while self.peek() not in (None, 'OR', ')'):
+            if self.peek() == 'AND':
+                self.take()
+            parts.append(self.parse_not())
+        return parts[0] if len(parts) == 1 else And(parts)
+
+    def parse_not(self):
+        token = self.take()
+        if token == 'NOT':
+            return Not(self.parse_not())
+        if token == '(':
+            node = self.parse_or()
+            if self.take() != ')':
+                raise QueryError('Missing )')
+            return node
+        if isinstance(token, Term):
+            return token
+        raise QueryError('Unexpected end of query' if token is None else f'Unexpected {token!r}')
+
+
+class Query:
+    # запит компілюється один раз: дерево умов для планувальника і предикат над account_keys()
+    def __init__(self, text):
+        self.text = text
+        self.root = Parser(tokenize(text)).parse()
+        self.match = self.root.compile()
+
+    def plan(self, book):
+        plan = self.root.plan(book)
+        return None if plan is None else plan[1]
+
+
+@lru_cache(maxsize=256)
+def compile_query(text):
+    return Query(text)
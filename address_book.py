@@ -1,19 +1,38 @@
-from contact import Name, Phone, Record, Address, Birthday, Email
+from contact import Name, Phone, Birthday, Email, ValidPhoneException, ValidNameException
 from collections import UserDict
-from abc import ABC, abstractmethod
-import re
+import calendar
 import json
-from datetime import datetime, date, timedelta
+from datetime import datetime, timedelta
+from datetime import datetime as dt
+
+from phone_index import PhoneIndex
+from search_index import NGramIndex
+from birthday_index import BirthdayIndex
+from name_index import NameIndex, encode_cursor, decode_cursor
+from field_index import INDEX_KINDS
+from account_query import QUERY_LIMIT, account_keys, compile_query
+from batch_log import get_logger
+
+LOG_FILE = 'logs.txt'
 
 
 
 class AddressBook(UserDict):
-    def add_record(self, record: Record):
-        self.data[record.name] = record
+    def __init__(self, *args, **kwargs):
+        self.phone_index = PhoneIndex()
+        # n-грами номерів для пошуку частини номера будь-де в ньому
+        self.phone_grams = NGramIndex()
+        self.birthday_index = BirthdayIndex()
+        self.name_index = NameIndex()
+        # категорія -> індекс значень у тому вигляді, в якому їх порівнює search()
+        self.field_indexes = {}
+        # ім'я -> нормалізовані значення полів для query()
+        self.search_keys = {}
+        super().__init__(*args, **kwargs)
 
     def __str__(self):
         result = []
-        for account in self.data:
+        for account in self.data.values():
             if account['birthday']:
                 birth = account['birthday'].strftime("%d/%m/%Y")
             else:
@@ -21,7 +40,6 @@ class AddressBook(UserDict):
             if account['phones']:
                 new_value = []
                 for phone in account['phones']:
-                    print(phone)
                     if phone:
                         new_value.append(phone)
                 phone = ', '.join(new_value)
@@ -49,30 +67,84 @@ class AddressBook(UserDict):
         return self
 
     def __setitem__(self, index, contact):
-        self.data[index] = {'name': contact.name,
-                            'phones': contact.phones,
-                            'birthday': contact.birthday}
-                            # 'email': contact.email,
-                            # 'address': contact.address}
+        if isinstance(contact, dict):
+            account = contact
+        else:
+            account = self.to_account(contact)
+        self.data[index] = account
+        self.index_account(index, account)
+
+    def __delitem__(self, index):
+        del self.data[index]
+        self.phone_index.discard(index)
+        self.phone_grams.discard(index)
+        self.birthday_index.discard(index)
+        self.name_index.discard(index)
+        self.search_keys.pop(index, None)
+        for field_index in self.field_indexes.values():
+            field_index.discard(index)
 
     def __getitem__(self, index):
         return self.data[index]
 
+    @staticmethod
+    def to_account(record):
+        birthday = record.birthday
+        if isinstance(birthday, Birthday):
+            birthday = birthday.value_of()
+        if isinstance(birthday, str):
+            birthday = datetime.strptime(birthday, '%Y-%m-%d')
+        emails = getattr(record, 'emails', [])
+        return {'name': record.get_name(),
+                'phones': [Phone(phone).value_of() for phone in record.phones],
+                'birthday': birthday,
+                'email': getattr(record, 'email', emails[0] if emails else ''),
+                'status': getattr(record, 'status', ''),
+                'note': getattr(record, 'note', '')}
+                # 'address': contact.address}
+
+    @staticmethod
+    def search_key(value):
+        return str(value).lower().replace(' ', '')
+
+    def index_account(self, name, account):
+        self.name_index.add(name)
+        self.search_keys[name] = account_keys(account)
+        self.phone_index.add(name, account['phones'])
+        self.phone_grams.add(name, account['phones'])
+        self.birthday_index.add(name, account['birthday'])
+        for category, field_index in self.field_indexes.items():
+            field_index.add(name, (self.search_key(account[category]),))
+
+    def add_index(self, category, kind='hash'):
+        field_index = INDEX_KINDS[kind]()
+        for name, account in self.data.items():
+            field_index.add(name, (self.search_key(account[category]),))
+        self.field_indexes[category] = field_index
+        return field_index
+
+    def rebuild_index(self):
+        self.phone_index.clear()
+        self.phone_grams.clear()
+        self.birthday_index.clear()
+        self.name_index = NameIndex(self.data)
+        self.search_keys.clear()
+        for field_index in self.field_indexes.values():
+            field_index.clear()
+        for name, account in self.data.items():
+            self.index_account(name, account)
+        for field_index in self.field_indexes.values():
+            if hasattr(field_index, 'order'):
+                field_index.order()
+
     def log(self, action):
-        current_time = dt.strftime(dt.now(), '%H:%M:%S')
-        message = f'[{current_time}] {action}'
-        with open('logs.txt', 'a') as file:
-            file.write(f'{message}\n')
+        # рядок стає в чергу, у logs.txt його пачкою допише фоновий потік
+        get_logger(LOG_FILE).log(action)
 
     def add(self, record):
-        account = {'name': Pecord.name,
-                'phones': Pecord.phones,
-                'birthday': Pecord.birthday,
-                'email': Pecord.email,
-                'status': Pecord.status,
-                'note': Pecord.note}
-        self.data.append(account)
-        self.log(f"Contact {Pecord.name} has been added.")
+        account = self.to_account(record)
+        self[account['name']] = account
+        self.log(f"Contact {account['name']} has been added.")
 
 
     def dump(self, file_name='addressbook.bin'):
@@ -89,6 +161,7 @@ class AddressBook(UserDict):
         if file_name:
             with open(file_name, 'rb') as file:
                 self.data = json.load(file)
+            self.rebuild_index()
             self.log("Addressbook has been loaded!")
         else:
             self.log('Adressbook has been created!')
@@ -99,42 +172,88 @@ class AddressBook(UserDict):
         category_new = category.strip().lower().replace(' ', '')
         pattern_new = pattern.strip().lower().replace(' ', '')
 
-        for account in self.data:
-            if category_new == 'phones':
-
-                for phone in account['phones']:
-
-                    if phone.lower().startswith(pattern_new):
-                        result.append(account)
-            elif account[category_new].lower().replace(' ', '') == pattern_new:
-                result.append(account)
+        if category_new == 'phones':
+            # номери шукаємо за префіксом через цифрове дерево; дерево повертає множину, тож результат - за іменем
+            for name in sorted(self.phone_index.starts_with(pattern_new)):
+                result.append(self.data[name])
+        elif category_new in self.field_indexes:
+            for name in self.field_indexes[category_new].get(pattern_new):
+                result.append(self.data[name])
+        elif category_new in ('name', 'email', 'note'):
+            # значення вже нормалізовані при індексації
+            for name, keys in self.search_keys.items():
+                if pattern_new in keys[category_new]:
+                    result.append(self.data[name])
+        else:
+            for account in self.data.values():
+                if self.search_key(account[category_new]) == pattern_new:
+                    result.append(account)
         if not result:
             print('There is no such contact in address book!')
         return result
 
+    @staticmethod
+    def edit_value(account, parameter, new_value):
+        # перевірене значення поля у форматі рахунку; ValueError, якщо поле або значення невірні
+        if parameter not in account.keys():
+            raise ValueError
+        if parameter == 'birthday':
+            new_value = Birthday(new_value).value_of()
+            if new_value is None:
+                raise ValueError
+            new_value = datetime.strptime(new_value, '%Y-%m-%d')
+        elif parameter == 'email':
+            new_value = Email(new_value).value_of()
+        # elif parameter == 'status':
+        #     new_value = Status(new_value).value
+        elif parameter == 'phones':
+            try:
+                new_value = [Phone(number).value_of() for number in new_value.split(' ')]
+            except ValidPhoneException:
+                raise ValueError from None
+        elif parameter == 'name':
+            try:
+                new_value = Name(new_value).value_of()
+            except ValidNameException:
+                raise ValueError from None
+        return new_value
+
+    def rename(self, old_name, new_name):
+        # ім'я - ключ словника, тож рахунок переїжджає під новий ключ разом з усіма індексами
+        account = self.data[old_name]
+        del self[old_name]
+        account['name'] = new_name
+        self[new_name] = account
+
+    # запит на кшталт 'name^ann AND (phones~067 OR NOT email=a@b.com)': = - точно, ^ - префікс, ~ - містить;
+    # рахунки без повторів, за іменем, не більше limit
+    def query(self, text, limit=QUERY_LIMIT):
+        query = compile_query(text)
+        candidates = query.plan(self)
+        names = self.name_index.names if candidates is None else sorted(candidates())
+        result = []
+        for name in names:
+            keys = self.search_keys.get(name)
+            if keys is not None and query.match(keys):
+                result.append(self.data[name])
+                if len(result) == limit:
+                    break
+        return result
+
     def edit(self, contact_name, parameter, new_value):
-        names = []
+        # контакт знаходимо за ключем словника, без перебору всієї книги
+        account = self.data.get(contact_name)
         try:
-            for account in self.data:
-                names.append(account['name'])
-                if account['name'] == contact_name:
-                    if parameter == 'birthday':
-                        new_value = Birthday(new_value).value
-                    elif parameter == 'email':
-                        new_value = Email(new_value).value
-                    # elif parameter == 'status':
-                    #     new_value = Status(new_value).value
-                    elif parameter == 'phones':
-                        new_contact = new_value.split(' ')
-                        new_value = []
-                        for number in new_contact:
-                            new_value.append(Phone(number).value)
-                    if parameter in account.keys():
-                        account[parameter] = new_value
-                    else:
-                        raise ValueError
-            if contact_name not in names:
+            if account is None:
                 raise NameError
+            new_value = self.edit_value(account, parameter, new_value)
+            if parameter == 'name':
+                if new_value != contact_name and new_value in self.data:
+                    raise ValueError
+                self.rename(contact_name, new_value)
+            else:
+                account[parameter] = new_value
+                self.index_account(contact_name, account)
         except ValueError:
             print('Incorrect parameter! Please provide correct parameter')
         except NameError:
@@ -144,13 +263,51 @@ class AddressBook(UserDict):
             return True
         return False
 
+    def edit_many(self, updates):
+        # updates - трійки (ім'я, поле, значення); спершу перевіряються всі, і якщо хоч одна невірна,
+        # книга лишається без змін
+        checked = []
+        # перейменування в пакеті: нове ім'я -> рахунок, старе ім'я -> None
+        renamed = {}
+        for contact_name, parameter, new_value in updates:
+            account = renamed[contact_name] if contact_name in renamed else self.data.get(contact_name)
+            if account is None:
+                print(f'There is no such contact in address book: {contact_name}')
+                return False
+            try:
+                new_value = self.edit_value(account, parameter, new_value)
+                if parameter == 'name' and new_value != contact_name:
+                    taken = renamed[new_value] is not None if new_value in renamed else new_value in self.data
+                    if taken:
+                        raise ValueError
+                    renamed[contact_name] = None
+                    renamed[new_value] = account
+                checked.append((contact_name, account, parameter, new_value))
+            except ValueError:
+                print(f'Incorrect parameter {parameter} for {contact_name}! Please provide correct parameter')
+                return False
+        edited = {}
+        for contact_name, account, parameter, new_value in checked:
+            if parameter == 'name':
+                if new_value != contact_name:
+                    self.rename(contact_name, new_value)
+                    edited.pop(contact_name, None)
+                    edited[new_value] = account
+                continue
+            account[parameter] = new_value
+            edited[contact_name] = account
+        for contact_name, account in edited.items():
+            self.index_account(contact_name, account)
+        if edited:
+            self.log(f"Contacts {', '.join(edited)} have been edited!")
+        return True
+
     def remove(self, pattern):
         flag = False
-        for account in self.data:
-            if account['name'] == pattern:
-                self.data.remove(account)
-                self.log(f"Contact {account['name']} has been removed!")
-                flag = True
+        if pattern in self.data:
+            del self[pattern]
+            self.log(f"Contact {pattern} has been removed!")
+            flag = True
             '''if pattern in account['phones']:
                         account['phones'].remove(pattern)
                         self.log.log(f"Phone number of {account['name']} has been removed!")'''
@@ -168,45 +325,43 @@ class AddressBook(UserDict):
     def congratulate(self):
         result = []
         WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        current_year = dt.now().year
         congratulate = {'Monday': [], 'Tuesday': [], 'Wednesday': [], 'Thursday': [], 'Friday': []}
-        for account in self.data:
-            if account['birthday']:
-                new_birthday = account['birthday'].replace(year=current_year)
-                birthday_weekday = new_birthday.weekday()
-                if self.__get_current_week()[0] <= new_birthday.date() < self.__get_current_week()[1]:
-                    if birthday_weekday < 5:
-                        congratulate[WEEKDAYS[birthday_weekday]].append(account['name'])
-                    else:
-                        congratulate['Monday'].append(account['name'])
+        week_start, week_end = self.__get_current_week()
+        for name, weekday in self.birthday_index.workdays(week_start, week_end):
+            congratulate[WEEKDAYS[weekday]].append(name)
         for key, value in congratulate.items():
             if len(value):
                 result.append(f"{key}: {' '.join(value)}")
         return '_' * 50 + '\n' + '\n'.join(result) + '\n' + '_' * 50
 
+    def birthdays_per_month(self):
+        return dict(zip(calendar.month_name[1:], self.birthday_index.per_month()))
 
     def add_record(self, contact):
-        self.data[contact.name] = contact
+        self[contact.get_name()] = contact
 
     def remove_contact(self, contact):
-        self.data.pop(contact.name, None)
+        self.delete(contact.get_name())
+
+    # сторінка контактів за іменем після курсора: (контакти, курсор наступної сторінки або None)
+    def page(self, cursor=None, size=20):
+        names = self.name_index.after(decode_cursor(cursor), size + 1)
+        next_cursor = encode_cursor(names[size - 1]) if len(names) > size else None
+        return [self.data[name] for name in names[:size]], next_cursor
 
     def iterator(self, item_number):
-        counter = 0
-        result = ''
-        for item, record in self.data.items():
-            result += f'{item}: {record}'
-            counter += 1
-            if counter >= item_number:
-                yield result
-                counter = 0
-                result = ''
-            return counter
+        cursor = None
+        while True:
+            accounts, cursor = self.page(cursor, item_number)
+            if accounts:
+                yield ''.join(f"{account['name']}: {account}" for account in accounts)
+            if cursor is None:
+                return
 
     def find_information_by_name(self, search_name):
         users_search = []
         for user, info in self.data.items():
-            if search_name.lower() in info.search_name.value.lower():
+            if search_name.lower() in info['name'].lower():
                 users_search.append(self.data[user])
         if users_search:
             return users_search
@@ -214,12 +369,12 @@ class AddressBook(UserDict):
             return "Nothing found"
 
     def find_information_by_phone(self, search_phone):
+        # частина номера будь-де в ньому, як і при переборі книги; перевіряються лише кандидати з n-грам, за іменем
+        search_phone = str(search_phone)
         users_search = []
-        for user, info in self.data.items():
-            if info.phones and info.phones[0].value != None:
-                for phone in info.phones:
-                    if str(search_phone) in phone.value:
-                        users_search.append(self.data[user])
+        for user in sorted(self.phone_grams.candidates(search_phone)):
+            if any(phone and search_phone in phone for phone in self.data[user]['phones']):
+                users_search.append(self.data[user])
         if users_search:
             return users_search
         else:
@@ -227,7 +382,7 @@ class AddressBook(UserDict):
 
     def delete(self, name):
         if name in self.data:
-            del self.data[name]
+            del self[name]
 
     # def dump(self, file_name='addressbook.json'):
     #     with open(file_name, 'wb') as file:
@@ -0,0 +1,133 @@
+import atexit
+import json
+import os
+import queue
+import time
+from datetime import datetime
+from threading import Thread, Event, Lock
+
+# рядки пишуться пачками: коли накопичилось LOG_BATCH_SIZE рядків або минуло LOG_FLUSH_INTERVAL секунд
+LOG_BATCH_SIZE = 1000
+LOG_FLUSH_INTERVAL = 1.0
+# при перевищенні розміру logs.txt стає logs.txt.1, старіші копії зсуваються, зайві видаляються
+LOG_MAX_BYTES = 10 * 2 ** 20
+LOG_BACKUPS = 3
+# True - кожен рядок є JSON-об'єктом {"time": ..., "action": ...}
+LOG_JSON = False
+
+STOP = object()
+LOGGERS = {}
+LOGGERS_LOCK = Lock()
+
+
+class BatchLogger:
+    # черга в пам'яті, яку фоновий потік розбирає пачками: файл відкривається раз на пачку, а не на рядок
+    def __init__(self, path, batch_size=LOG_BATCH_SIZE, interval=LOG_FLUSH_INTERVAL, max_bytes=LOG_MAX_BYTES,
+                 backups=LOG_BACKUPS, json_lines=LOG_JSON):
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.json_lines = json_lines
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+        self.lock = Lock()
+        # остання помилка запису; рядки пачки, яку не вдалося записати, відкидаються
+        self.error = None
+        self.dropped = 0
+
+    def log(self, action):
+        # час фіксується в момент виклику, а не запису
+        if self.thread is None or not self.thread.is_alive():
+            self.start()
+        self.queue.put((datetime.now(), action))
+
+    def start(self):
+        # потік, що завершився через несподівану помилку, запускається знову, щоб черга не росла без кінця
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                if self.thread is None:
+                    atexit.register(self.close)
+                self.thread = Thread(target=self.run, name='batch-logger', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        batch = []
+        deadline = time.monotonic() + self.interval
+        while True:
+            try:
+                item = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                item = None
+            if item is STOP or isinstance(item, Event):
+                try:
+                    self.write(batch)
+                finally:
+                    # flush() не чекає вічно, навіть якщо запис упав
+                    batch = []
+                    if item is not STOP:
+                        item.set()
+                if item is STOP:
+                    return
+            elif item is not None:
+                batch.append(item)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self.write(batch)
+                batch = []
+                deadline = time.monotonic() + self.interval
+
+    def format(self, moment, action):
+        if self.json_lines:
+            return json.dumps({'time': moment.isoformat(timespec='milliseconds'), 'action': action},
+                              ensure_ascii=False, default=str) + '\n'
+        return f'[{moment.strftime("%H:%M:%S")}] {action}\n'
+
+    def write(self, batch):
+        if not batch:
+            return
+        try:
+            self.rotate()
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(''.join(self.format(moment, action) for moment, action in batch))
+        except OSError as error:
+            # недоступний файл журналу не зупиняє потік: наступні пачки спробують записати знову
+            self.error = error
+            self.dropped += len(batch)
+
+    def rotate(self):
+        if not self.max_bytes or not os.path.exists(self.path) or os.path.getsize(self.path) < self.max_bytes:
+            return
+        if not self.backups:
+            os.remove(self.path)
+            return
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f'{self.path}.{i}'):
+                os.replace(f'{self.path}.{i}', f'{self.path}.{i + 1}')
+        os.replace(self.path, f'{self.path}.1')
+
+    def flush(self):
+        # чекає, доки все, що вже в черзі, буде записано у файл
+        if self.thread is None:
+            return
+        self.start()
+        done = Event()
+        self.queue.put(done)
+        done.wait()
+
+    def close(self):
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            self.queue.put(STOP)
+            thread.join()
+            atexit.unregister(self.close)
+
+
+def get_logger(path, **options):
+    # один записувач на файл, скільки б книг у нього не писало
+    path = os.path.abspath(path)
+    with LOGGERS_LOCK:
+        if path not in LOGGERS:
+            LOGGERS[path] = BatchLogger(path, **options)
+        return LOGGERS[path]
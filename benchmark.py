@@ -0,0 +1,545 @@
+import gc
+import io
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from contextlib import redirect_stdout
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import contact
+from contact import Phone, Email, ValidPhoneException, check_phone, check_email
+from contact import Record, Name, Address, Birthday, AddressBook, parse_birthday
+from fuzzy_index import FuzzyIndex
+from phone_index import phone_digits, prefix_digits
+import birthday_index
+
+
+# попередній варіант перевірки номера, для порівняння
+def legacy_validate_phone(phone):
+    phone_number = (phone.strip()
+                    .replace('(', '')
+                    .replace(')', '')
+                    .replace('-', '')
+                    .replace(' ', '')
+                    .replace('+', ''))
+    if len(phone_number) == 13:
+        if re.match('^\\+38\\d{10}$', phone_number):
+            return f'{phone_number}'
+    elif len(phone_number) == 12:
+        if re.match('^\\d{12}$', phone_number):
+            return '+' + phone_number
+    elif len(phone_number) == 10:
+        if re.match('^\\d{10}$', phone_number):
+            return '+38' + phone_number
+    else:
+        raise ValidPhoneException('Invalid phone number! Please enter correct number phone!')
+
+
+def legacy_validate_email(email):
+    if re.match(r'^[\w]{1,}([\w.+-]{0,1}[\w]{1,}){0,}@[\w]{1,}([\w-]{0,1}[\w]{1,}){0,}([.][a-zA-Z]{2,}|[.][\w-]{2,}[.][a-zA-Z]{2,})$',
+                email):
+        return email
+    else:
+        raise ValueError('Invalid email address! Please enter correct email')
+
+
+def generate_phones(count, seed=1, international=0.0):
+    # international - частка закордонних номерів (+48, +49, +44... з 10 цифрами після коду)
+    rnd = random.Random(seed)
+    formats = ['0{}', '+38 ({}) {}-{}', '380{}', '+380{}', '{}']
+    result = []
+    for _ in range(count):
+        digits = ''.join(rnd.choices('0123456789', k=9))
+        if international and rnd.random() < international:
+            result.append(f'+{rnd.choice(COUNTRY_CODES)}{digits}{rnd.randrange(10)}')
+            continue
+        form = rnd.choice(formats)
+        if form == '+38 ({}) {}-{}':
+            result.append(form.format('0' + digits[:2], digits[2:5], digits[5:]))
+        else:
+            result.append(form.format(digits))
+    return result
+
+
+def generate_emails(count, seed=1):
+    rnd = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    domains = ['gmail.com', 'ukr.net', 'i.ua', 'example.com.ua', 'bad']
+    return [''.join(rnd.choices(letters, k=rnd.randint(3, 10))) + '@' + rnd.choice(domains) for _ in range(count)]
+
+
+def per_object(values, legacy):
+    result = []
+    for value in values:
+        try:
+            result.append(legacy(value))
+        except (ValueError, ValidPhoneException):
+            result.append(None)
+    return result
+
+
+def timeit(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def bench_validation(count=1_000_000):
+    phones = generate_phones(count)
+    emails = generate_emails(count)
+
+    for title, values, legacy, batch, normalizer in (
+            ('phones', phones, legacy_validate_phone, Phone.validate_many, check_phone),
+            ('emails', emails, legacy_validate_email, Email.validate_many, check_email)):
+        normalizer.cache_clear()
+        old_time, old_result = timeit(per_object, values, legacy)
+        new_time, (new_result, errors) = timeit(batch, values)
+        assert old_result == new_result
+        print(f'{title:<7} {count} values: per-object {old_time:.2f}s, '
+              f'batch {new_time:.2f}s ({count / new_time:,.0f}/s), errors {len(errors)}')
+
+
+CITIES = ['Kyiv', 'Lviv', 'Odesa', 'Kharkiv', 'Dnipro', 'Poltava', 'Warsaw', 'Berlin']
+COUNTRY_CODES = ['48', '49', '44', '33', '39', '34']
+
+
+def generate_records(count, seed=1, international=0.0):
+    rnd = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    phones = generate_phones(count * 2, seed, international)
+    for i in range(count):
+        # рядки міст і країн приходять з файлу чи вводу, тож це окремі об'єкти
+        city = ''.join(rnd.choice(CITIES))
+        country = ''.join(['U', 'A'])
+        record = Record(Name(f'{rnd.choice(letters).upper()}{"".join(rnd.choices(letters, k=7))}{i}'),
+                        address=Address(country, city, 'Shevchenka', rnd.randint(1, 200)),
+                        birthday=Birthday((date(1960, 1, 1) + timedelta(days=rnd.randrange(20000))).isoformat()))
+        record.phones = tuple(p for p in (check_phone(phones[2 * i])[0], check_phone(phones[2 * i + 1])[0]) if p)
+        record.emails = (f'{"".join(rnd.choices(letters, k=8))}{i}@gmail.com',)
+        yield record
+
+
+def bench_memory(counts=(100_000, 1_000_000)):
+    for count in counts:
+        tracemalloc.start()
+        records = list(generate_records(count))
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'{count} records: {size / count:.0f} bytes per contact ({size / 2 ** 20:.0f} MiB)')
+        del records
+
+
+SYLLABLES = ['ka', 'ro', 'le', 'na', 'ser', 'iy', 'ok', 'sa', 'dr', 'an', 'ko', 'pe', 'tr', 'en', 'vo', 'ly',
+             'mi', 'ha', 'yl', 'o', 'ch', 'uk']
+
+
+def generate_names(count, seed=1):
+    # імена та прізвища повторюються, як у справжній книзі: словник значно менший за кількість контактів
+    rnd = random.Random(seed)
+
+    def word():
+        return ''.join(rnd.choices(SYLLABLES, k=rnd.randint(2, 4))).capitalize()
+
+    first = [word() for _ in range(max(count // 300, 10))]
+    last = [word() for _ in range(max(count // 25, 10))]
+    return list({f'{rnd.choice(first)} {rnd.choice(last)}': None for _ in range(count)})
+
+
+def bench_fuzzy(count=1_000_000, queries=200):
+    names = generate_names(count)
+    index = FuzzyIndex()
+    build, _ = timeit(lambda: [index.add(name) for name in names])
+    rnd = random.Random(2)
+    # одна заміна і одна втрачена літера в кожному запиті
+    typos = [name.replace('a', 'o', 1)[:-1] for name in rnd.sample(names, queries)]
+    times = sorted(timeit(index.search, query)[0] for query in typos)
+    print(f'{len(names)} names: index {build:.1f}s, {len(index.words)} words; '
+          f'search median {times[len(times) // 2] * 1e3:.2f}ms, max {times[-1] * 1e3:.2f}ms')
+
+
+# ---------------------------------------------------------------------------------------------------------
+# набір замірів з результатом у JSON: однаковий seed дає однакові дані, тож запуски можна порівнювати
+
+SUITE_SIZES = (1_000, 100_000, 1_000_000)
+SUITE_QUERIES = 100
+REGRESSION_THRESHOLD = 0.2
+# зміни, менші за це (у секундах), - шум вимірювання, а не регресія
+REGRESSION_FLOOR = 0.001
+# разові заміри (dump, load, sort) повторюються стільки разів, у звіт іде найкращий час
+SUITE_REPEAT = 3
+TAGS = ['work', 'home', 'study', 'ideas', 'shopping', 'travel', 'health', 'books', 'music', 'family']
+TREE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'svg', 'mp3', 'ogg', 'wav', 'avi', 'mp4', 'mkv', 'doc', 'docx', 'txt',
+                   'pdf', 'xlsx', 'pptx', 'zip', 'tar.gz', 'rar', 'bin', '']
+TREE_NAMES = ['звіт', 'фото', 'report', 'song', 'video', 'документ', 'notes', 'backup']
+
+
+def median_time(func, args_list):
+    times = sorted(timeit(func, *args)[0] for args in args_list)
+    return times[len(times) // 2]
+
+
+def best_time(func, repeat=SUITE_REPEAT):
+    # як timeit.repeat: мінімум найменше залежить від інших процесів на машині
+    return min(timeit(func)[0] for _ in range(repeat))
+
+
+def generate_book(count, seed=1):
+    book = AddressBook()
+    book.add_records(generate_records(count, seed, international=0.1))
+    return book
+
+
+def generate_notebook(count, seed=1):
+    # notes.py потребує rich, тож модуль імпортується лише для цього заміру
+    from notes import NoteBook, RecordNote, NoteName, Notes, Tags
+    rnd = random.Random(seed)
+    notebook = NoteBook()
+    for i in range(count):
+        record = RecordNote(NoteName(f'note{i}'), Notes(' '.join(rnd.choices(TAGS, k=8))), Tags(rnd.choice(TAGS)))
+        for tag in rnd.sample(TAGS, rnd.randint(0, 3)):
+            notebook_tag = Tags(tag)
+            if tag not in [item.value for item in record.tags]:
+                record.tags.append(notebook_tag)
+        notebook.add_note(record)
+    return notebook
+
+
+def write_archive(path, extension):
+    if extension == 'zip':
+        with zipfile.ZipFile(path, 'w') as archive:
+            archive.writestr('inside.txt', 'archived')
+    else:
+        with tarfile.open(path, 'w:gz') as archive:
+            data = b'archived'
+            info = tarfile.TarInfo('inside.txt')
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+
+def generate_tree(root, count, seed=1, depth=4, width=5):
+    # вкладені папки з файлами різних розширень, кирилицею в іменах та справжніми архівами
+    rnd = random.Random(seed)
+    folders = [Path(root)]
+    for _ in range(max(count // 50, 1)):
+        parent = rnd.choice(folders)
+        if len(parent.relative_to(root).parts) < depth and len(folders) < count:
+            folder = parent / f'{rnd.choice(TREE_NAMES)}_{len(folders)}'
+            folder.mkdir()
+            folders.append(folder)
+    for i in range(count):
+        extension = rnd.choice(TREE_EXTENSIONS)
+        name = f'{rnd.choice(TREE_NAMES)} {i}' + (f'.{extension}' if extension else '')
+        path = rnd.choice(folders[:width] if i % 10 == 0 else folders) / name
+        if extension in ('zip', 'tar.gz'):
+            write_archive(path, extension)
+        else:
+            path.write_bytes(b'x' * rnd.randint(0, 64))
+
+
+def reset_sort():
+    import sort
+    sort.reset()
+    return sort
+
+
+def suite_find_record(book, queries, seed=1):
+    rnd = random.Random(seed)
+    names = list(book.data)
+    # частина імені, частина номера і рядок, якого немає в книзі
+    parts = []
+    for _ in range(queries):
+        record = book.data[rnd.choice(names)]
+        parts.append(rnd.choice([record.get_name()[1:5], record.phones[0][-6:] if record.phones else 'zzzz', 'qqqx']))
+    return {'seconds': median_time(book.find_record, [(part,) for part in parts]), 'queries': queries}
+
+
+def suite_dump_load(book, folder):
+    path, contact.BOOK_NAME = contact.BOOK_NAME, os.path.join(folder, 'bench_book.bin')
+    try:
+        dump = best_time(book.dump)
+        books = []
+
+        def load_book():
+            loaded = AddressBook()
+            loaded.load(False, 0)
+            books.append(len(loaded))
+        load = best_time(load_book)
+        assert books == [len(book)] * len(books)
+        size = os.path.getsize(contact.BOOK_NAME)
+    finally:
+        contact.BOOK_NAME = path
+    return {'dump': {'seconds': dump, 'bytes': size}, 'load': {'seconds': load}}
+
+
+def suite_notes(count, queries, seed=1):
+    notebook = generate_notebook(count, seed)
+    rnd = random.Random(seed)
+    return {'seconds': median_time(notebook.find_info_by_tag, [(rnd.choice(TAGS),) for _ in range(queries)]),
+            'queries': queries}
+
+
+def suite_sort(count, folder, seed=1):
+    # сортування переносить файли, тож кожен повтор отримує нове дерево
+    times = []
+    root = Path(folder) / 'tree'
+    for _ in range(SUITE_REPEAT):
+        root.mkdir()
+        generate_tree(root, count, seed)
+        sort = reset_sort()
+        try:
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                times.append(timeit(sort.main, root)[0])
+        finally:
+            reset_sort()
+            shutil.rmtree(root, ignore_errors=True)
+    return {'seconds': min(times), 'files': count}
+
+
+def run_suite(sizes=SUITE_SIZES, seed=1, queries=SUITE_QUERIES):
+    results = {}
+    for size in sizes:
+        print(f'--- {size} ---', file=sys.stderr)
+        book = generate_book(size, seed)
+        results[f'find_record/{size}'] = suite_find_record(book, queries, seed)
+        with tempfile.TemporaryDirectory() as folder:
+            for name, value in suite_dump_load(book, folder).items():
+                results[f'{name}/{size}'] = value
+            del book
+            try:
+                results[f'find_info_by_tag/{size}'] = suite_notes(size, queries, seed)
+            except ImportError as error:
+                # без rich замір нотаток пропускається, а не падає весь набір
+                results[f'find_info_by_tag/{size}'] = {'skipped': str(error)}
+            results[f'sort_folder/{size}'] = suite_sort(size, folder, seed)
+        for key, value in results.items():
+            if key.endswith(f'/{size}') and 'seconds' in value:
+                print(f'{key:<28} {value["seconds"] * 1e3:12.2f}ms', file=sys.stderr)
+    return {'meta': {'created': datetime.now().isoformat(timespec='seconds'),
+                     'python': platform.python_version(),
+                     'platform': platform.platform(),
+                     'seed': seed,
+                     'queries': queries,
+                     'repeat': SUITE_REPEAT,
+                     'sizes': list(sizes)},
+            'results': results}
+
+
+def compare_results(baseline, current, threshold=REGRESSION_THRESHOLD, floor=REGRESSION_FLOOR):
+    # регресія - замір, що став повільнішим більш ніж на threshold (0.2 = на 20%) і більш ніж на floor секунд
+    regressions = []
+    for key, value in current['results'].items():
+        old = baseline['results'].get(key, {})
+        if 'seconds' not in value or not old.get('seconds'):
+            continue
+        ratio = value['seconds'] / old['seconds']
+        slower = value['seconds'] - old['seconds'] > floor
+        flag = 'REGRESSION' if ratio > 1 + threshold and slower else ''
+        print(f'{key:<28} {old["seconds"] * 1e3:12.2f}ms {value["seconds"] * 1e3:12.2f}ms {ratio:6.2f}x {flag}')
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def bench_suite(out='-', *sizes):
+    report = run_suite(tuple(int(size) for size in sizes) or SUITE_SIZES)
+    text = json.dumps(report, indent=2)
+    if out == '-':
+        print(text)
+    else:
+        with open(out, 'w', encoding='utf-8') as file:
+            file.write(text + '\n')
+
+
+def bench_compare(baseline, current, threshold=REGRESSION_THRESHOLD, floor=REGRESSION_FLOOR):
+    with open(baseline, encoding='utf-8') as file:
+        old = json.load(file)
+    with open(current, encoding='utf-8') as file:
+        new = json.load(file)
+    regressions = compare_results(old, new, float(threshold), float(floor))
+    if regressions:
+        print(f'{len(regressions)} regressions above {float(threshold):.0%}')
+        sys.exit(1)
+
+
+# ---------------------------------------------------------------------------------------------------------
+# холодний старт асистента: імпорт contact і час до першого запиту команди
+
+STARTUP_RUNS = 10
+PROMPT = b'Input command'
+
+
+def python_time(code, runs=STARTUP_RUNS):
+    return median_time(subprocess.run, [([sys.executable, '-c', code],) for _ in range(runs)])
+
+
+def first_prompt_time(folder):
+    # асистент запускається з копії модулів у тимчасовій папці, тож книга створюється там, а не в робочій
+    process = subprocess.Popen([sys.executable, os.path.join(folder, 'contact.py')], cwd=folder,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    start = time.perf_counter()
+    output = b''
+    while PROMPT not in output:
+        chunk = process.stdout.read1(4096)
+        if not chunk:
+            break
+        output += chunk
+    seconds = time.perf_counter() - start
+    process.communicate(b'exit\n')
+    return seconds
+
+
+def import_profile(top=10):
+    # python -X importtime: модулі з найбільшим сумарним часом імпорту, мкс
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import contact'],
+                            capture_output=True, text=True, cwd=contact.WORK_DIR).stderr
+    modules = []
+    for line in stderr.splitlines()[1:]:
+        _, own, cumulative, name = (part.strip() for part in line.replace(':', '|', 1).split('|'))
+        modules.append((int(cumulative), name))
+    return dict((name, cumulative) for cumulative, name in sorted(modules, reverse=True)[:top])
+
+
+def bench_startup(out='-', runs=STARTUP_RUNS):
+    runs = int(runs)
+    with tempfile.TemporaryDirectory() as folder:
+        for path in Path(contact.WORK_DIR).glob('*.py'):
+            shutil.copy(path, folder)
+        first_prompt = sorted(first_prompt_time(folder) for _ in range(runs))[runs // 2]
+    report = {'meta': {'python': platform.python_version(), 'runs': runs},
+              'results': {'python/startup': {'seconds': python_time('pass', runs)},
+                          'contact/import': {'seconds': python_time(f'import sys; sys.path.insert(0, {str(contact.WORK_DIR)!r}); import contact', runs)},
+                          'assistant/first_prompt': {'seconds': first_prompt}},
+              'imports_us': import_profile()}
+    for key, value in report['results'].items():
+        print(f'{key:<28} {value["seconds"] * 1e3:12.2f}ms', file=sys.stderr)
+    text = json.dumps(report, indent=2)
+    if out == '-':
+        print(text)
+    else:
+        with open(out, 'w', encoding='utf-8') as file:
+            file.write(text + '\n')
+
+
+def bench_birthdays(count=1_000_000):
+    # ті самі запити рядками (bisect) і стовпцями numpy; результати мають збігатися
+    rnd = random.Random(1)
+    book = AddressBook()
+    for i in range(count):
+        birthday = date(1960, 1, 1) + timedelta(days=rnd.randrange(20000))
+        book.data[f'contact{i}'] = Record(Name(f'contact{i}'), birthday=Birthday(birthday.isoformat()))
+    # індекс будується тим самим шляхом, що й при завантаженні книги та першому пошуку у mapped і columnar
+    rebuild_time, _ = timeit(book.rebuild_index)
+    index = book.birthday_index
+    order_time, _ = timeit(index.order)
+    print(f'indexes for {count} contacts rebuilt in {rebuild_time:.2f}s, birthdays sorted in {order_time:.2f}s')
+    today = date.today()
+    week_start = today - timedelta(days=today.weekday())
+    queries = {'congratulate week': lambda: index.workdays(week_start, week_start + timedelta(days=7)),
+               'upcoming 30 days': lambda: index.upcoming(30, today),
+               'upcoming 365 days': lambda: index.upcoming(365, today),
+               'count per month': index.per_month}
+    columns_min = birthday_index.COLUMNS_MIN
+    try:
+        birthday_index.COLUMNS_MIN = count + 1
+        rows = {title: timeit(query) for title, query in queries.items()}
+        birthday_index.COLUMNS_MIN = 0
+        build, columns = timeit(index.columns)
+        if columns is None:
+            print('numpy is not installed, only the row path is measured')
+        else:
+            print(f'columns for {count} birthdays built in {build:.2f}s')
+        for title, query in queries.items():
+            row_time, row_result = rows[title]
+            line = f'{title:<18} {len(row_result):>8} found: rows {row_time * 1e3:9.1f}ms'
+            if columns is not None:
+                column_time, column_result = timeit(query)
+                assert column_result == row_result, title
+                line += f', columns {column_time * 1e3:9.1f}ms ({row_time / max(column_time, 1e-9):.1f}x)'
+            print(line)
+        if columns is not None:
+            # запит одразу після зміни: стовпці латаються, а не будуються заново
+            title, query = 'congratulate week', queries['congratulate week']
+            # як у стандартному timeit: повний прохід збирача сміття по мільйону кортежів не потрапляє в замір
+            gc.disable()
+            try:
+                edited, result = timeit(lambda: (index.add('contact0', week_start), query())[1])
+            finally:
+                gc.enable()
+            birthday_index.COLUMNS_MIN = count + 2
+            assert result == query(), title
+            print(f'{title:<18} edit and query: columns {edited * 1e3:9.1f}ms')
+    finally:
+        birthday_index.COLUMNS_MIN = columns_min
+
+
+def build_store(count, columnar):
+    # розмір сховища без кешів перевірки, які тримають рядки номерів і дати
+    from columnar_book import ColumnarRecords
+    tracemalloc.start()
+    store = ColumnarRecords() if columnar else {}
+    for record in generate_records(count, international=0.1):
+        store[record.get_name()] = record
+    check_phone.cache_clear()
+    parse_birthday.cache_clear()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return store, size
+
+
+def bench_columnar(count=1_000_000, prefix='+38067', month=3):
+    # словник записів проти стовпців: пам'ять і перегляд усіх контактів за номером та місяцем народження
+    from columnar_book import month_days
+    digits = prefix_digits(prefix)
+    rows, rows_size = build_store(count, columnar=False)
+    columns, columns_size = build_store(count, columnar=True)
+    print(f'{count} contacts: dict {rows_size / count:.0f} bytes per contact ({rows_size / 2 ** 20:.0f} MiB), '
+          f'columns {columns_size / count:.0f} bytes per contact ({columns_size / 2 ** 20:.0f} MiB)')
+    scans = {
+        f'phone {prefix}': (
+            lambda: [name for name, record in rows.items()
+                     if any(phone_digits(phone).startswith(digits) for phone in record.phones)],
+            lambda: columns.phone_prefix(digits)),
+        f'born in month {month}': (
+            lambda: [name for name, record in rows.items()
+                     if (birthday := record.birthday_date()) is not None and birthday.month == month],
+            lambda: columns.born_between(*month_days(month))),
+    }
+    for title, (scan_rows, scan_columns) in scans.items():
+        rows_time, found = timeit(scan_rows)
+        columns_time, names = timeit(scan_columns)
+        assert sorted(found) == sorted(names), title
+        # записи збираються лише для знайдених контактів
+        materialize, _ = timeit(lambda: [columns[name] for name in names])
+        print(f'{title:<20} {len(found):>8} found: dict {rows_time * 1e3:8.1f}ms, columns {columns_time * 1e3:8.1f}ms '
+              f'({rows_time / max(columns_time, 1e-9):.1f}x), records for hits {materialize * 1e3:8.1f}ms')
+
+
+BENCHMARKS = {
+    'validation': lambda count=1_000_000: bench_validation(int(count)),
+    'memory': lambda *counts: bench_memory(tuple(int(c) for c in counts) or (100_000, 1_000_000)),
+    'fuzzy': lambda count=1_000_000: bench_fuzzy(int(count)),
+    'birthdays': lambda count=1_000_000: bench_birthdays(int(count)),
+    'columnar': lambda count=1_000_000: bench_columnar(int(count)),
+    'suite': bench_suite,
+    'compare': bench_compare,
+    'startup': bench_startup,
+}
+
+
+if __name__ == '__main__':
+    # python benchmark.py <validation|memory|fuzzy|birthdays|columnar> [розміри]
+    # python benchmark.py suite [result.json] [розміри]; python benchmark.py compare old.json new.json [поріг]
+    # python benchmark.py startup [result.json] [запусків]
+    name = sys.argv[1] if len(sys.argv) > 1 else 'validation'
+    BENCHMARKS[name](*sys.argv[2:])
@@ -0,0 +1,80 @@
+from calendar import isleap
+from datetime import date
+
+import numpy as np
+
+# зсув першого дня місяця від 1 січня (індекс - номер місяця) для звичайного і високосного року
+MONTH_STARTS = {
+    False: np.array([0, 0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334], dtype=np.int64),
+    True: np.array([0, 0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335], dtype=np.int64),
+}
+# 1970-01-01, нуль для datetime64[D], - четвер
+EPOCH_WEEKDAY = 3
+
+
+def month_day(month, day):
+    # (місяць, день) одним числом, що зберігає порядок
+    return month * 32 + day
+
+
+class BirthdayColumns:
+    # місяці й дні BirthdayIndex стовпцями numpy у тому ж порядку; ключі беруться з самого items,
+    # тож BirthdayIndex має внести в стовпці всі свої зміни до запиту
+    def __init__(self, items):
+        count = len(items)
+        self.items = items
+        # вузькі типи: кожна вставка чи видалення копіює стовпці, тож що менше байтів, то швидше
+        self.months = np.fromiter((month for month, _, _ in items), dtype=np.uint8, count=count)
+        self.days = np.fromiter((day for _, day, _ in items), dtype=np.uint8, count=count)
+        self.month_days = month_day(self.months.astype(np.int16), self.days)
+
+    def apply(self, changes):
+        # зміни BirthdayIndex: ('add', позиція, місяць, день) або ('delete', позиція)
+        for change in changes:
+            if change[0] == 'add':
+                _, i, month, day = change
+                self.months = np.insert(self.months, i, month)
+                self.days = np.insert(self.days, i, day)
+                self.month_days = np.insert(self.month_days, i, month_day(month, day))
+            else:
+                i = change[1]
+                self.months = np.delete(self.months, i)
+                self.days = np.delete(self.days, i)
+                self.month_days = np.delete(self.month_days, i)
+
+    def occurrences(self, year, lo, hi):
+        # дати днів народження items[lo:hi] у році year; 29 лютого в невисокосний рік - 28 лютого
+        months = self.months[lo:hi]
+        days = self.days[lo:hi]
+        offsets = MONTH_STARTS[isleap(year)][months] + days - 1
+        if not isleap(year):
+            offsets -= (months == 2) & (days == 29)
+        return np.datetime64(date(year, 1, 1), 'D') + offsets
+
+    def select(self, ranges):
+        # ranges - діапазони BirthdayIndex.ranges; результат - (список ключів, масив дат) у порядку настання
+        keys = []
+        dates = [np.empty(0, dtype='datetime64[D]')]
+        for year, low, high in ranges:
+            lo = np.searchsorted(self.month_days, month_day(*low), 'left')
+            hi = np.searchsorted(self.month_days, month_day(*high), 'right')
+            keys += [key for _, _, key in self.items[lo:hi]]
+            dates.append(self.occurrences(year, lo, hi))
+        return keys, np.concatenate(dates)
+
+    @staticmethod
+    def weekdays(dates):
+        return (dates.astype(np.int64) + EPOCH_WEEKDAY) % 7
+
+    def workdays(self, ranges):
+        # день привітання: понеділок..п'ятниця (0..4), вихідні переносяться на понеділок
+        keys, dates = self.select(ranges)
+        weekdays = self.weekdays(dates)
+        return keys, np.where(weekdays >= 5, 0, weekdays)
+
+    def upcoming(self, ranges, today):
+        keys, dates = self.select(ranges)
+        return keys, (dates - np.datetime64(today, 'D')).astype(np.int64)
+
+    def per_month(self):
+        return np.bincount(self.months, minlength=13)[1:]
@@ -0,0 +1,164 @@
+from bisect import bisect_left
+from calendar import isleap
+from datetime import date, timedelta
+
+# від цієї кількості днів народження запити рахуються стовпцями numpy (якщо numpy встановлено)
+COLUMNS_MIN = 10_000
+# до стількох змін після побудови стовпці латаються на місці, більше - будуються заново
+COLUMNS_PATCH_LIMIT = 16
+
+
+class BirthdayIndex:
+    # впорядкований список (місяць, день, ключ) для запитів по діапазону дат через bisect
+    def __init__(self):
+        self.items = []
+        self.days = {}
+        # як у SortedIndex: після clear() записи лише дописуються, а список сортується один раз при першому запиті
+        self.ordered = True
+        # стовпці будуються при першому запиті; зміни після цього накопичуються і вносяться в них при наступному
+        self.columns_cache = None
+        self.column_changes = []
+
+    def order(self):
+        if not self.ordered:
+            self.items.sort()
+            self.ordered = True
+
+    def add(self, key, birthday):
+        self.discard(key)
+        if birthday is None:
+            return
+        month_day = (birthday.month, birthday.day)
+        self.days[key] = month_day
+        if not self.ordered:
+            self.items.append((*month_day, key))
+            return
+        i = bisect_left(self.items, (*month_day, key))
+        self.items.insert(i, (*month_day, key))
+        self.column_change(('add', i, *month_day))
+
+    def discard(self, key):
+        month_day = self.days.pop(key, None)
+        if month_day is None:
+            return
+        self.order()
+        i = bisect_left(self.items, (*month_day, key))
+        if i < len(self.items) and self.items[i] == (*month_day, key):
+            del self.items[i]
+            self.column_change(('delete', i))
+
+    def clear(self):
+        self.items.clear()
+        self.days.clear()
+        self.columns_cache = None
+        self.column_changes.clear()
+        self.ordered = False
+
+    def column_change(self, change):
+        # позиція зміни відносно items на момент зміни, тож зміни вносяться в стовпці в тому ж порядку
+        if self.columns_cache is None:
+            return
+        if len(self.column_changes) < COLUMNS_PATCH_LIMIT:
+            self.column_changes.append(change)
+        else:
+            self.columns_cache = None
+            self.column_changes.clear()
+
+    def columns(self):
+        # None - книга замала, щоб стовпці окупились, або numpy не встановлено
+        if len(self.items) < COLUMNS_MIN:
+            return None
+        self.order()
+        if self.columns_cache is None:
+            try:
+                from birthday_columns import BirthdayColumns
+            except ImportError:
+                return None
+            self.columns_cache = BirthdayColumns(self.items)
+        elif self.column_changes:
+            self.columns_cache.apply(self.column_changes)
+            self.column_changes.clear()
+        return self.columns_cache
+
+    @staticmethod
+    def occurrence(year, month, day):
+        # у невисокосний рік народжені 29 лютого святкують 28 лютого
+        if (month, day) == (2, 29) and not isleap(year):
+            return date(year, 2, 28)
+        return date(year, month, day)
+
+    @staticmethod
+    def ranges(start: date, end: date):
+        # проміжок [start, end) розбиваємо по роках на діапазони (рік, (місяць, день), (місяць, день))
+        for year in range(start.year, end.year + 1):
+            first = max(start, date(year, 1, 1))
+            last = min(end, date(year + 1, 1, 1)) - timedelta(days=1)
+            if first > last:
+                continue
+            high = (last.month, last.day)
+            if high == (2, 28) and not isleap(year):
+                high = (2, 29)
+            yield year, (first.month, first.day), high
+
+    def between(self, start: date, end: date):
+        # дні народження в проміжку [start, end), у порядку настання: пари (ключ, дата)
+        columns = self.columns()
+        if columns is not None:
+            keys, dates = columns.select(self.ranges(start, end))
+            return list(zip(keys, dates.tolist()))
+        self.order()
+        result = []
+        for year, low, high in self.ranges(start, end):
+            lo = bisect_left(self.items, low)
+            hi = bisect_left(self.items, (high[0], high[1] + 1))
+            for month, day, key in self.items[lo:hi]:
+                result.append((key, self.occurrence(year, month, day)))
+        return result
+
+    @classmethod
+    def window(cls, days: int, today: date):
+        # не більше року вперед, щоб кожен контакт потрапив лише один раз
+        days = min(days, (cls.occurrence(today.year + 1, today.month, today.day) - today).days)
+        return today + timedelta(days=days)
+
+    def upcoming(self, days: int, today: date = None):
+        # дні народження в найближчі days днів: пари (ключ, скільки днів залишилось)
+        today = today or date.today()
+        columns = self.columns()
+        if columns is not None:
+            keys, deltas = columns.upcoming(self.ranges(today, self.window(days, today)), today)
+            return list(zip(keys, deltas.tolist()))
+        return [(key, (when - today).days) for key, when in self.between(today, self.window(days, today))]
+
+    def workdays(self, start: date, end: date):
+        # дні привітання в проміжку [start, end): пари (ключ, 0..4 - понеділок..п'ятниця),
+        # дні народження у вихідні вітаємо в понеділок
+        columns = self.columns()
+        if columns is not None:
+            keys, weekdays = columns.workdays(self.ranges(start, end))
+            return list(zip(keys, weekdays.tolist()))
+        result = []
+        for key, when in self.between(start, end):
+            weekday = when.weekday()
+            result.append((key, weekday if weekday < 5 else 0))
+        return result
+
+    def in_month(self, month):
+        # ключі з днем народження в цьому місяці, за днем
+        self.order()
+        lo = bisect_left(self.items, (month,))
+        hi = bisect_left(self.items, (month + 1,))
+        return [key for _, _, key in self.items[lo:hi]]
+
+    def per_month(self):
+        # кількість днів народження в кожному місяці, з січня по грудень
+        columns = self.columns()
+        if columns is not None:
+            return columns.per_month().tolist()
+        counts = [0] * 12
+        for month, _ in self.days.values():
+            counts[month - 1] += 1
+        return counts
+
+    def __len__(self):
+        return len(self.days)
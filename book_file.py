@@ -0,0 +1,131 @@
+import mmap
+import os
+import pickle
+import struct
+
+# формат файлу книги з індексом зміщень:
+# заголовок | записи (pickle) | імена (utf-8) | індекс, впорядкований за іменем
+BOOK_MAGIC = b'ABK1'
+HEADER = struct.Struct('<4sQQQ')     # magic, кількість записів, зміщення імен, зміщення індексу
+ENTRY = struct.Struct('<QIQI')       # зміщення імені, довжина імені, зміщення запису, довжина запису
+
+
+def is_book_file(path):
+    if not os.path.exists(path):
+        return False
+    with open(path, 'rb') as file:
+        return file.read(len(BOOK_MAGIC)) == BOOK_MAGIC
+
+
+class BookFile:
+    # доступ до записів через mmap: розпаковується лише той запис, до якого звертаються
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.names_offset, self.index_offset = HEADER.unpack_from(self.map, 0)
+        if magic != BOOK_MAGIC:
+            self.close()
+            raise ValueError(f'{path} is not an address book file')
+
+    def entry(self, i):
+        return ENTRY.unpack_from(self.map, self.index_offset + i * ENTRY.size)
+
+    def name_at(self, i):
+        name_offset, name_length, _, _ = self.entry(i)
+        return self.map[name_offset:name_offset + name_length].decode('utf-8')
+
+    def raw_at(self, i):
+        _, _, offset, length = self.entry(i)
+        return self.map[offset:offset + length]
+
+    def record_at(self, i):
+        return pickle.loads(self.raw_at(i))
+
+    def position(self, name):
+        # двійковий пошук по індексу без його повного читання
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.name_at(mid) < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, name):
+        i = self.position(name)
+        if i < self.count and self.name_at(i) == name:
+            return i
+        return None
+
+    def __contains__(self, name):
+        return self.find(name) is not None
+
+    def __len__(self):
+        return self.count
+
+    def names(self, start=0):
+        for i in range(start, self.count):
+            yield self.name_at(i)
+
+    def raw_items(self):
+        for i in range(self.count):
+            yield self.name_at(i), self.raw_at(i)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    @staticmethod
+    def write(path, items, replace=True):
+        # items - пари (ім'я, запис або вже запакований запис у bytes); порядок не важливий.
+        # replace=False - файл лишається поруч як path.tmp, заміну робить той, хто тримає path відкритим
+        tmp = path + '.tmp'
+        entries = []
+        with open(tmp, 'wb') as file:
+            file.write(HEADER.pack(BOOK_MAGIC, 0, 0, 0))
+            offset = HEADER.size
+            for name, record in items:
+                raw = record if isinstance(record, (bytes, bytearray)) else pickle.dumps(record)
+                file.write(raw)
+                entries.append((name, offset, len(raw)))
+                offset += len(raw)
+            entries.sort()
+            names_offset = offset
+            positions = []
+            for name, _, _ in entries:
+                raw_name = name.encode('utf-8')
+                file.write(raw_name)
+                positions.append((offset, len(raw_name)))
+                offset += len(raw_name)
+            index_offset = offset
+            for (name_offset, name_length), (_, record_offset, record_length) in zip(positions, entries):
+                file.write(ENTRY.pack(name_offset, name_length, record_offset, record_length))
+            file.seek(0)
+            file.write(HEADER.pack(BOOK_MAGIC, len(entries), names_offset, index_offset))
+            file.flush()
+            os.fsync(file.fileno())
+        if replace:
+            os.replace(tmp, path)
+        return tmp
+
+
+def read_book_file(path):
+    book = BookFile(path)
+    try:
+        return {name: pickle.loads(raw) for name, raw in book.raw_items()}
+    finally:
+        book.close()
+
+
+def read_raw(path):
+    # запаковані записи без розпаковування - для злиття журналу з файлом книги
+    if not is_book_file(path):
+        from journal import read_snapshot
+        return read_snapshot(path)
+    book = BookFile(path)
+    try:
+        return dict(book.raw_items())
+    finally:
+        book.close()
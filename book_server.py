@@ -0,0 +1,325 @@
+import asyncio
+import io
+import json
+import os
+import socket
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from contact import Record, Name, Birthday, Phone, Email, open_book, run_command, parse_birthday
+from command_registry import COMMANDS
+from exporter import record_to_dict
+
+# 'host:port' для TCP на localhost або 'unix:/шлях/до/сокета'
+SERVER_ADDRESS = '127.0.0.1:8765'
+SERVER_WORKERS = 8
+
+
+class NeedInput(Exception):
+    # команді забракло відповіді на запит - клієнт має її надіслати і повторити команду
+    def __init__(self, prompt):
+        super().__init__(prompt)
+        self.prompt = prompt
+
+
+class ReadWriteLock:
+    # багато читачів або один письменник; письменник, що чекає, не пропускає нових читачів
+    def __init__(self):
+        self.condition = asyncio.Condition()
+        self.readers = 0
+        self.writer = False
+        self.waiting_writers = 0
+
+    async def acquire_read(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: not self.writer and not self.waiting_writers)
+            self.readers += 1
+
+    async def release_read(self):
+        async with self.condition:
+            self.readers -= 1
+            if not self.readers:
+                self.condition.notify_all()
+
+    async def acquire_write(self):
+        async with self.condition:
+            self.waiting_writers += 1
+            try:
+                await self.condition.wait_for(lambda: not self.writer and not self.readers)
+            finally:
+                self.waiting_writers -= 1
+            self.writer = True
+
+    async def release_write(self):
+        async with self.condition:
+            self.writer = False
+            self.condition.notify_all()
+
+
+class ThreadOutput:
+    # print() з команд у робочих потоках потрапляє у буфер свого потоку, а не на консоль сервера
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def capture(self):
+        self.local.buffer = io.StringIO()
+        return self.local.buffer
+
+    def release(self):
+        self.local.buffer = None
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        return (buffer or self.stream).write(text)
+
+    def flush(self):
+        buffer = getattr(self.local, 'buffer', None)
+        (buffer or self.stream).flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def parse_address(address):
+    if address.startswith('unix:'):
+        return 'unix', address[5:]
+    host, _, port = address.rpartition(':')
+    return 'tcp', (host or '127.0.0.1', int(port))
+
+
+def record_answers(args):
+    values = iter(args)
+
+    def ask(prompt=''):
+        try:
+            return next(values)
+        except StopIteration:
+            raise NeedInput(prompt) from None
+    return ask
+
+
+class BookServer:
+    # одна книга на всіх клієнтів: пошук - під спільним блокуванням, зміни - під винятковим
+    def __init__(self, book=None, workers=SERVER_WORKERS):
+        self.book = book if book is not None else open_book()
+        self.lock = ReadWriteLock()
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='book-server')
+        self.output = None
+        self.prepare_book()
+
+    def prepare_book(self):
+        # ліниві індекси будуються зараз, щоб одночасні читачі їх не будували наперегонки
+        if hasattr(self.book, 'ensure_indexes'):
+            self.book.ensure_indexes()
+        self.book.find_fuzzy('')
+
+    async def run(self, op, *args, write=False):
+        if write:
+            await self.lock.acquire_write()
+        else:
+            await self.lock.acquire_read()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, op, *args)
+        finally:
+            if write:
+                await self.lock.release_write()
+            else:
+                await self.lock.release_read()
+
+    def find(self, request):
+        record = self.book.find(request['name'])
+        return record_to_dict(record) if record else None
+
+    def search(self, request):
+        return [record_to_dict(record) for record in self.book.find_record(request['part']).values()]
+
+    @staticmethod
+    def validated(values, validate_many):
+        normalized, errors = validate_many(list(values))
+        if errors:
+            _, value, error = errors[0]
+            raise ValueError(f'{value}: {error}')
+        return tuple(dict.fromkeys(normalized))
+
+    def fill_record(self, record, request, replace=False):
+        # спершу перевіряються всі значення: з помилкою запис лишається таким, як був
+        phones = self.validated(request.get('phones', ()), Phone.validate_many)
+        emails = self.validated(request.get('emails', ()), Email.validate_many)
+        birthday = request.get('birthday')
+        if birthday and parse_birthday(birthday) is None:
+            raise ValueError(f'{birthday}: Invalid birthday, expected yyyy-mm-dd')
+        # передані телефони та адреси замінюють наявні
+        if not (replace and 'phones' in request):
+            phones = tuple(dict.fromkeys(record.phones + phones))
+        if not (replace and 'emails' in request):
+            emails = tuple(dict.fromkeys(record.emails + emails))
+        record.phones = phones
+        record.emails = emails
+        if birthday:
+            record.birthday = Birthday(birthday)
+        if request.get('address'):
+            record.address = request['address']
+
+    def add(self, request):
+        name = request['name'].strip()
+        if not name:
+            raise ValueError("Name can't be empty")
+        if name in self.book:
+            raise ValueError(f'Contact {name} already exists')
+        record = Record(Name(name), birthday=Birthday(None))
+        self.fill_record(record, request)
+        self.book.add_record(record)
+        return record_to_dict(record)
+
+    def edit(self, request):
+        record = self.book.find(request['name'])
+        if record is None:
+            raise KeyError(request['name'])
+        self.fill_record(record, request, replace=True)
+        record.changed()
+        return record_to_dict(record)
+
+    def delete(self, request):
+        if request['name'] not in self.book:
+            raise KeyError(request['name'])
+        self.book.delete(request['name'])
+        return True
+
+    def command(self, request):
+        buffer = self.output.capture()
+        try:
+            try:
+                result = run_command(self.book, request['command'], record_answers(request.get('args', [])))
+            except NeedInput as need:
+                return {'ok': True, 'prompt': need.prompt, 'output': buffer.getvalue()}
+            return {'ok': True, 'result': bool(result), 'output': buffer.getvalue()}
+        finally:
+            self.output.release()
+
+    async def handle(self, request):
+        op = request.get('op')
+        if op == 'command':
+            command = str(request.get('command', '')).lower().strip()
+            request['command'] = command
+            # команди, які лише читають книгу, виконуються одночасно
+            reads = command in COMMANDS and COMMANDS[command].reads
+            return await self.run(self.command, request, write=not reads)
+        if op in ('find', 'search'):
+            return {'ok': True, 'result': await self.run(getattr(self, op), request)}
+        if op in ('add', 'edit', 'delete'):
+            return {'ok': True, 'result': await self.run(getattr(self, op), request, write=True)}
+        return {'ok': False, 'error': f'Unknown operation: {op}'}
+
+    async def serve_client(self, reader, writer):
+        # протокол - JSON lines: один запит - одна відповідь у тому ж порядку
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = await self.handle(json.loads(line))
+                except KeyError as error:
+                    response = {'ok': False, 'error': f'Not found: {error}'}
+                except Exception as error:
+                    response = {'ok': False, 'error': str(error) or type(error).__name__}
+                writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, address=SERVER_ADDRESS):
+        self.output = ThreadOutput(sys.stdout)
+        sys.stdout = self.output
+        kind, target = parse_address(address)
+        if kind == 'unix':
+            if os.path.exists(target):
+                os.remove(target)
+            server = await asyncio.start_unix_server(self.serve_client, target)
+        else:
+            server = await asyncio.start_server(self.serve_client, *target)
+        print(f'Address book server on {address}')
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            sys.stdout = self.output.stream
+            self.executor.shutdown()
+            self.book.exit()
+
+
+def serve(address=SERVER_ADDRESS):
+    try:
+        asyncio.run(BookServer().serve(address))
+    except KeyboardInterrupt:
+        print('Server stopped')
+
+
+class BookClient:
+    # синхронний клієнт: звичайний сокет і по рядку JSON на запит
+    def __init__(self, address=SERVER_ADDRESS):
+        kind, target = parse_address(address)
+        if kind == 'unix':
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(target)
+        else:
+            self.socket = socket.create_connection(target)
+        self.file = self.socket.makefile('rwb')
+
+    def request(self, op, **fields):
+        self.file.write(json.dumps({'op': op, **fields}, ensure_ascii=False).encode('utf-8') + b'\n')
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError('Server closed the connection')
+        return json.loads(line)
+
+    def command(self, command, ask=input):
+        # запити команди показуються тут; команда повторюється на сервері з уже зібраними відповідями
+        args = []
+        shown = 0
+        while True:
+            response = self.request('command', command=command, args=args)
+            if not response['ok']:
+                print(f'Error: {response["error"]}')
+                return False
+            output = response['output']
+            print(output[shown:], end='')
+            shown = len(output)
+            if 'prompt' not in response:
+                return response['result']
+            args.append(ask(response['prompt']))
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+
+def client(address=SERVER_ADDRESS):
+    # той самий діалог, що й assistant(), але книга живе на сервері
+    connection = BookClient(address)
+    print('*' * 50)
+    print(['Welcome to Assistant-bot'])
+    print(f'Connected to [{address}]')
+    print('-' * 50)
+    try:
+        while True:
+            command = input('Input command or "?" for help: > ').lower().strip()
+            print('*' * 20, f'{command}', '*' * (28 - len(command)))
+            if command == 'end' or command == 'exit':
+                print('Bye-Bye!')
+                break
+            # командам без книги сервер не потрібен - клієнт виконує їх сам
+            if command in COMMANDS and not COMMANDS[command].book:
+                result = run_command(None, command)
+            else:
+                result = connection.command(command)
+            print('*' * 50)
+            if result:
+                print('Result: OK')
+    finally:
+        connection.close()
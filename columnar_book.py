@@ -0,0 +1,255 @@
+import re
+import sys
+from array import array
+from collections.abc import MutableMapping
+from datetime import date, timedelta
+
+from contact import AddressBook, Record, Name, Address, Birthday, JOURNAL_MODE, AUTOSAVE_INTERVAL
+from mapped_book import LazyIndexes
+from phone_index import phone_digits, prefix_digits
+
+# номер у стовпці: роздільник і до 15 цифр (E.164), доповнених пробілами
+PHONE_DIGITS = 15
+PHONE_SLOT = PHONE_DIGITS + 1
+PHONE_START = b'\n'
+PHONE_DEAD = b'\0'
+PLAIN_PHONE = re.compile(r'^\+\d{1,15}$')
+# день року рахується за високосним календарем, тож 29 лютого має свій номер; 0 - без дня народження
+LEAP_YEAR = 2000
+# стовпці ущільнюються, коли видалених рядків стає більше, ніж живих
+COMPACT_MIN = 1024
+
+
+def day_of_year(month, day):
+    return (date(LEAP_YEAR, month, day) - date(LEAP_YEAR, 1, 1)).days + 1
+
+
+def month_days(month):
+    # перший і останній день місяця як дні року
+    last = (date(LEAP_YEAR + month // 12, month % 12 + 1, 1) - timedelta(days=1)).day
+    return day_of_year(month, 1), day_of_year(month, last)
+
+
+class ColumnarRecords(MutableMapping):
+    # записи стовпцями: рядок - номер контакту, Record збирається лише для знайдених рядків
+    def __init__(self, book=None):
+        self.book = book
+        self.rows = {}
+        self.names = []
+        # рядки адрес і міст повторюються, тож у стовпцях лише номери в таблиці рядків; 0 - немає значення
+        self.strings = [None]
+        self.string_ids = {None: 0}
+        self.countries = array('I')
+        self.cities = array('I')
+        self.streets = array('I')
+        self.houses = array('i')
+        self.emails = []
+        self.years = array('H')
+        self.days = array('H')
+        # номери всіх рядків підряд: PHONE_SLOT байт на номер, власник - у phone_rows
+        self.phones = bytearray()
+        self.phone_rows = array('I')
+        self.phone_first = array('I')
+        self.phone_count = array('B')
+        # записи з полями, які не лягають у стовпці (номер не у форматі +цифри, адреса рядком), - як є
+        self.odd_phones = {}
+        self.odd_addresses = {}
+        self.dead = 0
+
+    def string_id(self, value):
+        if value not in self.string_ids:
+            self.string_ids[value] = len(self.strings)
+            self.strings.append(sys.intern(value) if isinstance(value, str) else value)
+        return self.string_ids[value]
+
+    def append_row(self, name, record):
+        row = len(self.names)
+        self.names.append(sys.intern(name))
+        self.rows[self.names[row]] = row
+        address = record.address
+        if isinstance(address, Address) and isinstance(address.house, int) and 0 <= address.house < 2 ** 31:
+            self.countries.append(self.string_id(address.country))
+            self.cities.append(self.string_id(address.city))
+            self.streets.append(self.string_id(address.street))
+            self.houses.append(address.house)
+        else:
+            if address is not None:
+                self.odd_addresses[row] = address
+            self.countries.append(0)
+            self.cities.append(0)
+            self.streets.append(0)
+            self.houses.append(-1)
+        self.emails.append('\n'.join(record.emails))
+        birthday = record.birthday_date()
+        self.years.append(birthday.year if birthday else 0)
+        self.days.append(day_of_year(birthday.month, birthday.day) if birthday else 0)
+        phones = record.phones
+        self.phone_first.append(len(self.phone_rows))
+        self.phone_count.append(min(len(phones), 255))
+        if len(phones) > 255 or not all(PLAIN_PHONE.match(phone) for phone in phones):
+            self.odd_phones[row] = tuple(phones)
+        for phone in phones[:255]:
+            digits = phone_digits(phone)[:PHONE_DIGITS]
+            self.phones += PHONE_START + digits.ljust(PHONE_DIGITS).encode('ascii')
+            self.phone_rows.append(row)
+        return row
+
+    def kill_row(self, row):
+        self.names[row] = None
+        self.emails[row] = ''
+        self.years[row] = 0
+        self.days[row] = 0
+        self.countries[row] = self.cities[row] = self.streets[row] = 0
+        first = self.phone_first[row]
+        for slot in range(first, first + self.phone_count[row]):
+            self.phones[slot * PHONE_SLOT] = PHONE_DEAD[0]
+        self.odd_phones.pop(row, None)
+        self.odd_addresses.pop(row, None)
+        self.dead += 1
+
+    def record_at(self, row):
+        name = self.names[row]
+        if row in self.odd_phones:
+            phones = self.odd_phones[row]
+        else:
+            first = self.phone_first[row] * PHONE_SLOT
+            phones = tuple('+' + self.phones[slot + 1:slot + PHONE_SLOT].decode('ascii').rstrip()
+                           for slot in range(first, first + self.phone_count[row] * PHONE_SLOT, PHONE_SLOT))
+        if row in self.odd_addresses:
+            address = self.odd_addresses[row]
+        elif self.houses[row] >= 0:
+            address = Address(self.strings[self.countries[row]], self.strings[self.cities[row]],
+                              self.strings[self.streets[row]], self.houses[row])
+        else:
+            address = None
+        birthday = None
+        if self.days[row]:
+            when = date(LEAP_YEAR, 1, 1) + timedelta(days=self.days[row] - 1)
+            birthday = date(self.years[row], when.month, when.day).isoformat()
+        record = Record(Name(name), address=address, birthday=Birthday(birthday))
+        record.phones = phones
+        record.emails = tuple(self.emails[row].split('\n')) if self.emails[row] else ()
+        record.book = self.book
+        return record
+
+    def __getitem__(self, name):
+        return self.record_at(self.rows[name])
+
+    def __setitem__(self, name, record):
+        # зміна запису - новий рядок у кінці стовпців, старий позначається видаленим
+        row = self.rows.pop(name, None)
+        if row is not None:
+            self.kill_row(row)
+        self.append_row(name, record)
+        record.book = self.book
+        self.compact_if_needed()
+
+    def __delitem__(self, name):
+        self.kill_row(self.rows.pop(name))
+        self.compact_if_needed()
+
+    def __contains__(self, name):
+        return name in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def compact_if_needed(self):
+        if self.dead > COMPACT_MIN and self.dead > len(self.rows):
+            self.compact()
+
+    def compact(self):
+        old = self.__dict__.copy()
+        rows = sorted(self.rows.values())
+        self.__init__(self.book)
+        for row in rows:
+            self.append_copy(old, row)
+
+    def append_copy(self, old, row):
+        # перенесення рядка зі старих стовпців без збирання Record
+        new = len(self.names)
+        name = old['names'][row]
+        self.names.append(name)
+        self.rows[name] = new
+        for column in ('countries', 'cities', 'streets'):
+            getattr(self, column).append(self.string_id(old['strings'][old[column][row]]))
+        self.houses.append(old['houses'][row])
+        self.emails.append(old['emails'][row])
+        self.years.append(old['years'][row])
+        self.days.append(old['days'][row])
+        first, count = old['phone_first'][row], old['phone_count'][row]
+        self.phone_first.append(len(self.phone_rows))
+        self.phone_count.append(count)
+        self.phones += old['phones'][first * PHONE_SLOT:(first + count) * PHONE_SLOT]
+        self.phone_rows.extend([new] * count)
+        if row in old['odd_phones']:
+            self.odd_phones[new] = old['odd_phones'][row]
+        if row in old['odd_addresses']:
+            self.odd_addresses[new] = old['odd_addresses'][row]
+
+    # фільтри по стовпцях: повертають імена, записи збирає книга лише для них
+    def phone_prefix(self, digits):
+        # роздільник перед кожним номером, тож кожне входження - початок номера, а не середина
+        if not digits:
+            return []
+        needle = PHONE_START + digits.encode('ascii')
+        names = {}
+        find = self.phones.find
+        position = find(needle)
+        while position >= 0:
+            name = self.names[self.phone_rows[position // PHONE_SLOT]]
+            names[name] = None
+            position = find(needle, position + PHONE_SLOT)
+        return list(names)
+
+    def born_between(self, low, high):
+        # low..high - дні року; numpy, якщо встановлено, порівнює весь стовпець за раз
+        if not self.days:
+            return []
+        try:
+            import numpy as np
+        except ImportError:
+            rows = [row for row, day in enumerate(self.days) if low <= day <= high]
+        else:
+            days = np.frombuffer(self.days, dtype=np.uint16)
+            rows = np.flatnonzero((days >= low) & (days <= high)).tolist()
+            del days
+        return [self.names[row] for row in sorted(rows, key=lambda row: (self.days[row], self.names[row]))]
+
+
+class ColumnarAddressBook(LazyIndexes, AddressBook):
+    # записи стовпцями в пам'яті: менше об'єктів на контакт, пошук за номером і місяцем народження -
+    # перегляд стовпців; решта індексів будується лише при першому пошуку
+    def __init__(self):
+        self.indexed = False
+        self.journal = None
+        self.track_changes()
+        self.create_indexes()
+        self.data = ColumnarRecords(self)
+
+    # у pickle потрапляє звичайна AddressBook з усіма записами
+    def __reduce__(self):
+        return AddressBook, (), {'data': dict(self.data.items())}
+
+    def record_changed(self, record):
+        # кожне читання збирає новий Record, тож зміненим вважається будь-який запис з іменем із книги
+        name = record.get_name()
+        if record.book is self and name in self.data:
+            self.data[name] = record
+            self.index_record(name, record)
+            self.log_change('set', name, record)
+
+    def find_phone_prefix(self, prefix: str):
+        return {name: self.data[name] for name in sorted(self.data.phone_prefix(prefix_digits(prefix)))}
+
+    def find_birth_month(self, month):
+        return {name: self.data[name] for name in self.data.born_between(*month_days(month))}
+
+    def load(self, journal=JOURNAL_MODE, autosave=AUTOSAVE_INTERVAL):
+        super().load(journal, autosave)
+        records, self.data = self.data, ColumnarRecords(self)
+        for name, record in records.items():
+            self.data.append_row(name, record)
@@ -0,0 +1,84 @@
+from importlib import import_module
+
+
+class Command:
+    # команда асистента; модуль з обробником імпортується лише при першому виклику
+    __slots__ = ('name', 'help', 'target', 'reads', 'book', 'handler')
+
+    def __init__(self, name, help, target, reads=False, book=True):
+        self.name = name
+        self.help = help
+        # 'модуль:функція'; функція приймає (книга, ask) і повертає True, якщо команда виконана
+        self.target = target
+        # reads - команда лише читає книгу, book - команді потрібна книга контактів
+        self.reads = reads
+        self.book = book
+        self.handler = None
+
+    def resolve(self):
+        if self.handler is None:
+            module, _, function = self.target.partition(':')
+            self.handler = getattr(import_module(module), function)
+        return self.handler
+
+    def __call__(self, my_book, ask):
+        return self.resolve()(my_book, ask)
+
+
+COMMANDS = {}
+
+
+def register(name, help, target, reads=False, book=True):
+    COMMANDS[name] = Command(name, help, target, reads, book)
+    return COMMANDS[name]
+
+
+def run_command(my_book, command, ask=input):
+    handler = COMMANDS.get(command)
+    if handler is None:
+        return False
+    return handler(my_book, ask)
+
+
+HELP_HEADER = ['- [end] or [exit]  - quit program']
+HELP_FOOTER = ['  python contact.py --batch FILE - run commands from file ("-" for stdin)',
+               '  python contact.py --serve [ADDRESS] - share the book with other assistants',
+               '  python contact.py --connect [ADDRESS] - work with the book of a running server',
+               '  python contact.py --stats - measure command latency']
+
+
+def help_lines():
+    return [*HELP_HEADER, *(f'- {f"[{name}]":<16} - {command.help}' for name, command in COMMANDS.items()),
+            *HELP_FOOTER]
+
+
+def show_help(my_book, ask):
+    for line in help_lines():
+        print(line)
+    return False
+
+
+register('add_contact', 'adding contact to book', 'contact_commands:add_contact')
+register('del_contact', 'remove contact from book', 'contact_commands:del_contact')
+register('add_address', 'adding address to contact', 'contact_commands:add_address')
+register('add_birthday', 'adding birthday to contact', 'contact_commands:add_birthday')
+register('add_email', 'adding email to contact', 'contact_commands:add_email')
+register('edit_email', 'edit email', 'contact_commands:edit_email')
+register('add_phone', 'adding phone number to contact', 'contact_commands:add_phone')
+register('edit_phone', 'edit phone number', 'contact_commands:edit_phone')
+register('find_record', 'search contact by symbols', 'contact_commands:find_record', reads=True)
+register('find_fuzzy', 'search contact by name with typos', 'contact_commands:find_fuzzy', reads=True)
+register('find_prefix', 'search contacts whose name starts with letters', 'contact_commands:find_prefix', reads=True)
+register('find_city', 'search contacts by city', 'contact_commands:find_city', reads=True)
+register('find_born', 'search contacts born between two dates', 'contact_commands:find_born', reads=True)
+register('dedupe', 'find and merge duplicate contacts', 'contact_commands:dedupe')
+register('show_birthdays', 'show all birtdays in book', 'contact_commands:show_birthdays', reads=True)
+register('show_book', 'show all contacts in book', 'contact_commands:show_book', reads=True)
+register('import_contacts', 'import contacts from CSV or vCard file', 'contact_commands:import_contacts')
+register('export_contacts', 'export contacts to JSON Lines, CSV or vCard', 'contact_commands:export_contacts',
+         reads=True)
+register('scan_folder', 'scan folder', 'tool_commands:scan_folder', book=False)
+register('sort_folder', 'sort folder', 'tool_commands:sort_folder', book=False)
+register('notes', 'case of notes', 'tool_commands:notes', book=False)
+register('stats', 'command latency (p50/p95/p99), start with --stats', 'tool_commands:stats', reads=True, book=False)
+register('?', 'this help', 'command_registry:show_help', reads=True, book=False)
@@ -2,12 +2,34 @@ from abc import ABC, abstractmethod
 import re
 from datetime import datetime, date
 from collections import UserDict
+from functools import lru_cache
 from pathlib import Path
 import os
-import pickle
+import sys
+import json
+import shlex
+
+from search_index import NGramIndex
+from phone_index import PhoneIndex
+from birthday_index import BirthdayIndex
+from fuzzy_index import FuzzyIndex, FUZZY_DISTANCE, FUZZY_LIMIT, FUZZY_SUGGESTIONS, FUZZY_SUGGEST_MAX
+from name_index import NameIndex, encode_cursor, decode_cursor
+from field_index import INDEX_KINDS, field_values, normalize_value
+from threading import Lock, RLock
+from latency import session, timed
+from command_registry import COMMANDS, run_command as registry_command
+from journal import Journal, AutoSaver, AUTOSAVE_INTERVAL, read_snapshot, write_snapshot
 
 WORK_DIR = Path(os.path.abspath(__file__)).parent 
 BOOK_NAME = str(WORK_DIR) + '//my_book.bin' 
+# зміни книги одразу дописуються в журнал my_book.bin.log
+JOURNAL_MODE = True
+# 'mapped' - my_book.bin з індексом зміщень (mapped_book.py), 'pickle' - my_book.bin цілком у pickle,
+# 'sqlite' - книга у базі my_book.db (sqlite_book.py), 'columnar' - записи стовпцями в пам'яті (columnar_book.py)
+BOOK_STORAGE = 'mapped'
+PAGE_SIZE = 20
+# вторинні індекси книги: поле -> 'sorted' (діапазони і префікси) або 'hash' (точне значення)
+INDEXED_FIELDS = {'name': 'sorted', 'city': 'hash', 'birthday': 'sorted'}
 
 
 class ValidPhoneException(Exception):
@@ -19,12 +41,23 @@ class ValidNameException(Exception):
 
 
 class ContactFormatterInfo(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def value_of(self):
         raise NotImplementedError
 
+    # відновлення як з __slots__, так і зі старих файлів, де поля зберігались у __dict__
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **(state[1] or {})}
+        for key, value in state.items():
+            setattr(self, key, value)
+
 
 class Name(ContactFormatterInfo):
+    __slots__ = ('name',)
+
     def __init__(self, name: str):
         if len(name) < 2:
             raise ValidNameException('Invalid name! Please enter a name with at least 2 symbols')
@@ -34,7 +67,83 @@ class Name(ContactFormatterInfo):
         return self.name
 
 
+PHONE_13 = re.compile(r'^\+38\d{10}$')
+PHONE_ERROR = 'Invalid phone number! Please enter correct number phone!'
+EMAIL_PATTERN = re.compile(r'^\w+(?:[.+-]\w+)*@\w+(?:-\w+)*(?:[.][a-zA-Z]{2,}|[.][\w-]{2,}[.][a-zA-Z]{2,})$')
+EMAIL_ERROR = 'Invalid email address! Please enter correct email'
+VALIDATION_CACHE_SIZE = 65536
+
+
+# кешуються пари (значення, помилка), тож повторна перевірка не повторює розбір рядка
+@lru_cache(maxsize=VALIDATION_CACHE_SIZE)
+def check_phone(phone: str):
+    phone_number = phone.strip()
+    if not phone_number.isdecimal():
+        phone_number = (phone_number.replace('(', '')
+                        .replace(')', '')
+                        .replace('-', '')
+                        .replace(' ', '')
+                        .replace('+', ''))
+    if len(phone_number) == 13:
+        if PHONE_13.match(phone_number):
+            return f'{phone_number}', None
+    elif len(phone_number) == 12:
+        if phone_number.isdecimal():
+            return '+' + phone_number, None
+    elif len(phone_number) == 10:
+        if phone_number.isdecimal():
+            return '+38' + phone_number, None
+    else:
+        return None, PHONE_ERROR
+    return None, None
+
+
+@lru_cache(maxsize=VALIDATION_CACHE_SIZE)
+def check_email(email: str):
+    if EMAIL_PATTERN.match(email):
+        return email, None
+    else:
+        return None, EMAIL_ERROR
+
+
+@lru_cache(maxsize=VALIDATION_CACHE_SIZE)
+def parse_birthday(birthday: str):
+    try:
+        return datetime.strptime(birthday, '%Y-%m-%d').date()
+    except (ValueError, TypeError):
+        return None
+
+
+def normalize_phone(phone: str):
+    phone_number, error = check_phone(phone)
+    if error:
+        raise ValidPhoneException(error)
+    return phone_number
+
+
+def normalize_email(email: str):
+    email, error = check_email(email)
+    if error:
+        raise ValueError(error)
+    return email
+
+
+# пакетна перевірка: нормалізовані значення (None для помилкових) та список помилок (індекс, значення, текст)
+def validate_many(values, checker):
+    result = []
+    errors = []
+    append = result.append
+    for i, value in enumerate(values):
+        normalized, error = checker(value)
+        if normalized is None:
+            errors.append((i, value, error or 'Invalid value'))
+        append(normalized)
+    return result, errors
+
+
 class Phone(ContactFormatterInfo):
+    __slots__ = ('phone',)
+
     def __init__(self, phone: str):
         self.phone = phone
 
@@ -42,29 +151,20 @@ class Phone(ContactFormatterInfo):
         return self.validate_phone()
 
     def validate_phone(self):
-        phone_number = (self.phone.strip()
-                        .replace('(', '')
-                        .replace(')', '')
-                        .replace('-', '')
-                        .replace(' ', '')
-                        .replace('+', ''))
-        if len(phone_number) == 13:
-            if re.match('^\\+38\d{10}$', phone_number):
-                return f'{phone_number}'
-        elif len(phone_number) == 12:
-            if re.match('^\d{12}$', phone_number):
-                return '+' + phone_number
-        elif len(phone_number) == 10:
-            if re.match('^\d{10}$', phone_number):
-                return '+38' + phone_number
-        else:
-            raise ValidPhoneException('Invalid phone number! Please enter correct number phone!')
+        return normalize_phone(self.phone)
+
+    @staticmethod
+    def validate_many(phones):
+        return validate_many(phones, check_phone)
 
 
 class Address(ContactFormatterInfo):
+    __slots__ = ('country', 'city', 'street', 'house')
+
     def __init__(self, country: str, city: str, street: str, house: int):
-        self.country = country
-        self.city = city
+        # країни та міста повторюються в тисячах контактів, тож тримаємо по одному рядку на значення
+        self.country = sys.intern(country) if isinstance(country, str) else country
+        self.city = sys.intern(city) if isinstance(city, str) else city
         self.street = street
         self.house = house
 
@@ -73,6 +173,8 @@ class Address(ContactFormatterInfo):
 
 
 class Birthday(ContactFormatterInfo):
+    __slots__ = ('birthday',)
+
     def __init__(self, birthday):
         self.birthday = birthday
 
@@ -83,15 +185,14 @@ class Birthday(ContactFormatterInfo):
         if self.birthday == None:
             return None
 
-        try:
-            datetime.strptime(self.birthday, '%Y-%m-%d')
-            return self.birthday
-
-        except ValueError:
+        if parse_birthday(self.birthday) is None:
             return None
+        return self.birthday
 
 
 class Email(ContactFormatterInfo):
+    __slots__ = ('email',)
+
     def __init__(self, email):
         self.email = email
 
@@ -99,26 +200,55 @@ class Email(ContactFormatterInfo):
         return self.validate_email()
 
     def validate_email(self):
-        if re.match(r'^[\w]{1,}([\w.+-]{0,1}[\w]{1,}){0,}@[\w]{1,}([\w-]{0,1}[\w]{1,}){0,}([.][a-zA-Z]{2,}|[.][\w-]{2,}[.][a-zA-Z]{2,})$',
-                self.email):
-            return self.email
-        else:
-            raise ValueError('Invalid email address! Please enter correct email')
+        return normalize_email(self.email)
+
+    @staticmethod
+    def validate_many(emails):
+        return validate_many(emails, check_email)
         
         
 class Record:
-    def __init__(self, name: ContactFormatterInfo, phone: ContactFormatterInfo, address: ContactFormatterInfo,
-                birthday: ContactFormatterInfo):
+    __slots__ = ('name', 'phone', 'address', 'birthday', 'emails', 'phones', 'book')
+
+    def __init__(self, name: ContactFormatterInfo, phone: ContactFormatterInfo = None,
+                 address: ContactFormatterInfo = None, birthday: ContactFormatterInfo = None):
         self.name = name
         self.phone = phone
         self.address = address
         self.birthday = birthday
-        self.emails = []
-        self.phones = []
+        self.emails = ()
+        self.phones = ()
+        self.book = None
+
+    # посилання на книгу не серіалізуємо, книга відновлює його сама
+    def __getstate__(self):
+        return {slot: getattr(self, slot, None) for slot in self.__slots__ if slot != 'book'}
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **(state[1] or {})}
+        self.phone = self.address = self.birthday = None
+        for key, value in state.items():
+            if key in ('phones', 'emails'):
+                value = tuple(value)
+            if key in self.__slots__:
+                setattr(self, key, value)
+        self.book = None
 
     def __str__(self):
         # return f"Contact name: {self.name.value}, phones: {'; '.join(p.value for p in self.phones)}, e-mails: {'; '.join(p.value for p in self.emails)}, address: {self.home}"
-        return f"Contact name: {self.name}, phones: {'; '.join(p for p in self.phones)}, e-mails: {'; '.join(p for p in self.emails)}, address: {self.address}, birthday: {self.birthday}"
+        return f"Contact name: {self.get_name()}, phones: {'; '.join(p for p in self.phones)}, e-mails: {'; '.join(p for p in self.emails)}, address: {self.address}, birthday: {self.birthday}"
+
+    def get_name(self):
+        if isinstance(self.name, ContactFormatterInfo):
+            return self.name.value_of()
+        return self.name
+
+    # повідомляємо книгу про зміну запису, щоб вона оновила свої індекси
+    def changed(self):
+        book = getattr(self, 'book', None)
+        if book is not None:
+            book.record_changed(self)
 
     # def get_phone_number(self):
     #     return f'{self.name.value_of()} : {self.phone.value_of()}'
@@ -132,86 +262,284 @@ class Record:
     # def __str__(self) -> str:
     #     return f'Contact name: {self.name}, phones: {";".join(str(p) for p in self.phones)}'
 
-    def add_phone(self, phone: Phone):
+    def add_phone(self, phone):
+        if not isinstance(phone, Phone):
+            phone = Phone(phone)
         new_phone = phone.value_of()
         if new_phone not in self.phones:
-            self.phones.append(new_phone)
+            self.phones += (new_phone,)
+            self.changed()
 
     def remove_phone(self, phone):
-        for ph in self.phones:
-            if ph == phone:
-                self.phones.remove(phone)
-
-    def find_phone(self, phone):
-        for phone_number in self.phones:
-            if phone_number == phone:
-                return phone_number
-        return None
+        if phone in self.phones:
+            self.phones = tuple(ph for ph in self.phones if ph != phone)
+            self.changed()
 
     #def __str__(self):
         #return f"Contact name: {self.name}, phones: {'; '.join(p for p in self.phones)}"
 
     def edit_phone(self, old_phone, new_phone):
-        old_phone = Phone.value_of(old_phone)
+        old_phone = Phone(old_phone).value_of()
         for phone_number in self.phones:
             if old_phone == phone_number:
-                self.phones.remove(phone_number)
-                self.phones.append(Phone.value_of(new_phone))
+                new_phone = Phone(new_phone).value_of()
+                self.phones = tuple(ph for ph in self.phones if ph != phone_number) + (new_phone,)
+                self.changed()
                 return
         raise ValueError
 
     def show_contact(self):
         return {"name": self.name,
-                "phone": [self.phone for self.phone in self.phones] if self.phones else [],
+                "phone": list(self.phones),
                 "birthday": self.birthday if self.birthday else self.birthday}
 
     def find_phone(self, phone_number: str):
-        phone_number = Phone.value_of(phone_number)
+        phone_number = Phone(phone_number).value_of()
 
         for phone in self.phones:
-            if phone.value == phone_number:
+            if phone == phone_number:
                 return phone
         return None
 
     def add_email(self, email: str):
-        tmp = Email.value_of(self.email)
-        if tmp:
-            self.emails.append(Email(email))
-        else:
+        try:
+            new_email = Email(email).value_of()
+        except ValueError:
             print(f'E-mail {email} is not valid.')
+            return
+        if new_email not in self.emails:
+            self.emails += (new_email,)
+            self.changed()
 
     def find_email(self, email: str):
-        for email in self.emails:
-            if email.value == email:
-                return email
+        for item in self.emails:
+            if item == email:
+                return item
         return None
 
     def edit_email(self, old_email, new_email):
         email_obj = self.find_email(old_email)
 
         if email_obj:
-            if Email.validate_email(new_email):
-                email_obj.value = new_email
+            new_email = Email(new_email).value_of()
+            self.emails = tuple(new_email if item == email_obj else item for item in self.emails)
+            self.changed()
             return True
         else:
             print(f'E-mail {old_email} not found.')
             return False
 
-    def days_to_birthday(self):
-        if self.birthday is None:
+    def set_address(self, address):
+        self.address = address
+        self.changed()
+
+    def set_birthday(self, birthday):
+        if not isinstance(birthday, Birthday):
+            birthday = Birthday(birthday)
+        self.birthday = birthday
+        self.changed()
+
+    def birthday_date(self):
+        birthday = self.birthday
+        if isinstance(birthday, Birthday):
+            birthday = birthday.birthday
+        if isinstance(birthday, str):
+            birthday = parse_birthday(birthday)
+        if isinstance(birthday, datetime):
+            birthday = birthday.date()
+        return birthday
+
+    def days_to_birthday(self, today: date = None):
+        birthday = self.birthday_date()
+        if birthday is None:
             return 'No contact with this birthday'
         else:
-            today = date.today()
-            next_birthday = date(today.year, self.birthday.month, self.birthday.day)
+            today = today or date.today()
+            next_birthday = BirthdayIndex.occurrence(today.year, birthday.month, birthday.day)
             if next_birthday < today:
-                next_birthday = next_birthday.replace(year=today.year + 1)
+                next_birthday = BirthdayIndex.occurrence(today.year + 1, birthday.month, birthday.day)
             days_to_birthday = (next_birthday - today).days
             return days_to_birthday
 
 class AddressBook(UserDict):
 
+    def __init__(self, *args, **kwargs):
+        self.create_indexes()
+        self.journal = None
+        self.track_changes()
+        super().__init__(*args, **kwargs)
+
+    def __setitem__(self, name, record):
+        if name in self.data:
+            self.unindex_record(name)
+        self.data[name] = record
+        record.book = self
+        self.index_record(name, record)
+        self.fuzzy_add(name)
+        self.order_add(name)
+        self.log_change('set', name, record)
+
+    def __delitem__(self, name):
+        record = self.data.pop(name)
+        record.book = None
+        self.unindex_record(name)
+        self.fuzzy_discard(name)
+        self.order_discard(name)
+        self.log_change('del', name)
+
+    # індекс не зберігаємо у файл, а перебудовуємо після завантаження
+    def __getstate__(self):
+        return {'data': self.data}
+
+    def __setstate__(self, state):
+        self.create_indexes()
+        self.journal = None
+        self.track_changes()
+        self.data = state['data']
+        self.rebuild_index()
+
+    def create_indexes(self):
+        self.index = NGramIndex()
+        self.phone_index = PhoneIndex()
+        self.birthday_index = BirthdayIndex()
+        # нечіткий індекс імен будується лише при першому нечіткому пошуку
+        self.fuzzy_index = None
+        # впорядковані імена для посторінкового перегляду - при першому запиті сторінки
+        self.name_index = None
+        self.field_indexes = {field: INDEX_KINDS[kind]() for field, kind in INDEXED_FIELDS.items()}
+
+    def track_changes(self):
+        # dirty - змінені після останнього збереження записи (None для видалених)
+        self.dirty = {}
+        self.dirty_lock = Lock()
+        # повторний вхід: збереження книги цілком може початись усередині save(), коли журнал переповнився
+        self.save_lock = RLock()
+        # нечіткий індекс будується під час пошуку, тож читачі сервера мають бачити лише побудований цілком
+        self.fuzzy_lock = Lock()
+        self.autosave = None
+
+    def log_change(self, action, name, record=None):
+        if self.journal is not None and self.autosave is None:
+            self.journal.append(action, name, record)
+            return
+        with self.dirty_lock:
+            self.dirty[name] = record if action == 'set' else None
+
+    def index_record(self, name, record):
+        self.index.add(name, [name, *record.phones, *record.emails])
+        self.phone_index.add(name, record.phones)
+        self.birthday_index.add(name, record.birthday_date())
+        for field, index in self.field_indexes.items():
+            index.add(name, field_values(field, name, record))
+
+    def unindex_record(self, name):
+        self.index.discard(name)
+        self.phone_index.discard(name)
+        self.birthday_index.discard(name)
+        for index in self.field_indexes.values():
+            index.discard(name)
+
+    # оголошення індексу на полі запису; наявні записи індексуються одразу
+    def add_index(self, field, kind='sorted'):
+        index = INDEX_KINDS[kind]()
+        index.clear()
+        for name, record in self.record_items():
+            index.add(name, field_values(field, name, record))
+        if hasattr(index, 'order'):
+            index.order()
+        self.field_indexes[field] = index
+        return index
+
+    def fuzzy_add(self, name):
+        if self.fuzzy_index is not None:
+            self.fuzzy_index.add(name)
+
+    def fuzzy_discard(self, name):
+        if self.fuzzy_index is not None:
+            self.fuzzy_index.discard(name)
+
+    def order_add(self, name):
+        if self.name_index is not None:
+            self.name_index.add(name)
+
+    def order_discard(self, name):
+        if self.name_index is not None:
+            self.name_index.discard(name)
+
+    def record_changed(self, record):
+        name = record.get_name()
+        if self.data.get(name) is record:
+            self.index_record(name, record)
+            self.log_change('set', name, record)
+
+    def rebuild_index(self):
+        self.index.clear()
+        self.phone_index.clear()
+        self.birthday_index.clear()
+        for index in self.field_indexes.values():
+            index.clear()
+        self.fuzzy_index = None
+        self.name_index = None
+        for name, record in self.record_items():
+            record.book = self
+            self.index_record(name, record)
+        for index in self.field_indexes.values():
+            if hasattr(index, 'order'):
+                index.order()
+
     def add_record(self, record: Record):
-        self.data[record.name.value] = record
+        self[record.get_name()] = record
+
+    # масове додавання: індекси перебудовуються один раз наприкінці, замість журналу - повний запис книги
+    def add_records(self, records):
+        names = []
+        for record in records:
+            name = record.get_name()
+            self.data[name] = record
+            record.book = self
+            self.fuzzy_add(name)
+            self.order_add(name)
+            names.append(name)
+        with self.dirty_lock:
+            self.dirty.update((name, self.data[name]) for name in names)
+        if len(names) * 4 < len(self.data):
+            # невелика пачка у великій книзі - дешевше проіндексувати лише її
+            for name in names:
+                self.index_record(name, self.data[name])
+        else:
+            self.rebuild_index()
+        if self.journal is not None:
+            self.dump()
+        return len(names)
+
+    # усі записи по черзі, без накопичення в пам'яті (для експорту)
+    def stream_records(self):
+        yield from self.data.values()
+
+    # пари (ім'я, запис) для побудови індексів
+    def record_items(self):
+        return self.data.items()
+
+    def names_after(self, name, size):
+        if self.name_index is None:
+            self.name_index = NameIndex(self.data)
+        return self.name_index.after(name, size)
+
+    # сторінка записів за іменем після курсора: (записи, курсор наступної сторінки або None)
+    def page(self, cursor=None, size=PAGE_SIZE):
+        names = self.names_after(decode_cursor(cursor), size + 1)
+        next_cursor = encode_cursor(names[size - 1]) if len(names) > size else None
+        return [self.data[name] for name in names[:size]], next_cursor
+
+    # усі записи книги сторінками по size, записи читаються лише для поточної сторінки
+    def pages(self, size=PAGE_SIZE):
+        cursor = None
+        while True:
+            records, cursor = self.page(cursor, size)
+            if records:
+                yield records
+            if cursor is None:
+                return
 
     
     def find(self, name: str):
@@ -222,54 +550,224 @@ class AddressBook(UserDict):
 
     def delete(self, name: str):
         if name in self.data:
-            del self.data[name]
+            del self[name]
+
+    # пошук контактів за номером телефону через цифрові дерева
+    # дерево номерів повертає множини імен, тож контакти впорядковуються за іменем
+    def find_phone(self, phone):
+        return {name: self.data[name] for name in sorted(self.phone_index.owners(Phone(phone).value_of()))}
+
+    def find_phone_prefix(self, prefix: str):
+        return {name: self.data[name] for name in sorted(self.phone_index.starts_with(prefix))}
+
+    def find_phone_suffix(self, suffix: str):
+        return {name: self.data[name] for name in sorted(self.phone_index.ends_with(suffix))}
+
+    # контакти з днем народження в найближчі days днів: пари (запис, днів до дня народження)
+    def upcoming_birthdays(self, days: int, today: date = None):
+        return [(self.data[name], delta) for name, delta in self.birthday_index.upcoming(days, today)]
+
+    # кількість днів народження по місяцях: список з 12 чисел, з січня по грудень
+    def birthdays_per_month(self):
+        return self.birthday_index.per_month()
+
+    # контакти, народжені в місяці month (1..12), за днем народження
+    def find_birth_month(self, month):
+        return {name: self.data[name] for name in self.birthday_index.in_month(month)}
+
+    @staticmethod
+    def match_record(part, item, record):
+        # пошук в name
+        if part.lower() in item.lower():
+            return True
+        # пошук в phones
+        for p in record.phones:
+            if part in str(p):
+                return True
+        # пошук в emails
+        for e in record.emails:
+            if part in str(e):
+                return True
+        return False
 
-    
     def find_record(self, part: str):
         result = {}
 
-        for item, record in self.items():
-            # пошук в phones
-            for p in record.phones:
-                if part in str(p):
-                    result[item] = self.data[item]
-
-            # пошук в name
-            if part.lower() in item.lower():
-                result[item] = self.data[item]
-            
-            # пошук в emails
-            for e in record.emails:
-                if part in str(e):
-                    result[item] = self.data[item]
+        # перевіряємо лише кандидатів з n-грамного індексу; індекс повертає множину, тож результат - за іменем
+        for item in sorted(self.index.candidates(part)):
+            record = self.data[item]
+            if self.match_record(part, item, record):
+                result[item] = record
 
         return result
+
+    # пошук за полем: через індекс, якщо він оголошений, інакше перебором записів
+    def scan_field(self, field, match):
+        found = []
+        for name, record in self.data.items():
+            values = [value for value in field_values(field, name, record) if match(value)]
+            if values:
+                found.append((min(values), name, record))
+        found.sort(key=lambda item: item[:2])
+        return {name: record for _, name, record in found}
+
+    def find_by(self, field, value):
+        value = normalize_value(value)
+        index = self.field_indexes.get(field)
+        if index is not None:
+            return {name: self.data[name] for name in index.get(value)}
+        return self.scan_field(field, lambda item: item == value)
+
+    def find_range(self, field, low=None, high=None):
+        low, high = normalize_value(low), normalize_value(high)
+        index = self.field_indexes.get(field)
+        if hasattr(index, 'range'):
+            return {name: self.data[name] for name in index.range(low, high)}
+        return self.scan_field(field, lambda item: (low is None or item >= low) and (high is None or item <= high))
+
+    def find_prefix(self, field, prefix):
+        prefix = normalize_value(prefix) or ''
+        index = self.field_indexes.get(field)
+        if hasattr(index, 'prefix'):
+            return {name: self.data[name] for name in index.prefix(prefix)}
+        return self.scan_field(field, lambda item: str(item).startswith(prefix))
+
+    def find_city(self, city: str):
+        return self.find_by('city', city)
+
+    def find_email(self, email: str):
+        return self.find_by('email', email)
+
+    # пошук імен з помилками: пари (запис, кількість правок), найближчі першими
+    def find_fuzzy(self, name: str, distance: int = FUZZY_DISTANCE, limit: int = FUZZY_LIMIT):
+        index = self.fuzzy_index
+        if index is None or index.max_distance < distance:
+            index = self.build_fuzzy_index(distance)
+        return [(self.data[key], value) for key, value in index.search(name, distance, limit)]
+
+    def build_fuzzy_index(self, distance):
+        with self.fuzzy_lock:
+            index = self.fuzzy_index
+            if index is None or index.max_distance < distance:
+                index = FuzzyIndex(max(distance, FUZZY_DISTANCE))
+                for key in self.data:
+                    index.add(key)
+                self.fuzzy_index = index
+            return index
+
+    # підказка після невдалого пошуку не будує нечіткий індекс великої книги заради одного запиту
+    def suggest_names(self, name: str, limit: int = FUZZY_SUGGESTIONS):
+        if self.fuzzy_index is None and len(self) > FUZZY_SUGGEST_MAX:
+            return []
+        return self.find_fuzzy(name, limit=limit)
     
-    # сериалізація адресної книги та запису її у файл
+    # сериалізація адресної книги та атомарний запис її у файл; порожня книга теж записується
     def dump(self):
-         with open(BOOK_NAME, 'wb') as file:   #'my_book.bin'
-            if len(self.data) > 0:
-                pickle.dump(self, file)
-                return True
-
+        with self.save_lock:
+            if self.journal is not None:
+                self.journal.wait()
+            with self.dirty_lock:
+                self.dirty = {}
+                data = dict(self.data)
+            write_snapshot(BOOK_NAME, data)   #'my_book.bin'
+            if self.journal is not None:
+                self.journal.reset()
+            return True
 
-    def load(self):
-        with open(BOOK_NAME, 'rb') as file: #'my_book.bin'
-            self.data = pickle.load(file)
+    def save(self):
+        # нічого не змінилось - нічого не пишемо; з журналом дописуються лише змінені записи
+        if not self.dirty:
+            return False
+        if self.journal is None:
+            return self.dump()
+        with self.save_lock:
+            with self.dirty_lock:
+                changes, self.dirty = self.dirty, {}
+            try:
+                for name, record in changes.items():
+                    self.journal.append('set' if record is not None else 'del', name, record)
+            except OSError:
+                with self.dirty_lock:
+                    self.dirty = {**changes, **self.dirty}
+                raise
+        return True
+
+    def start_autosave(self, interval=AUTOSAVE_INTERVAL):
+        if interval and self.autosave is None:
+            self.autosave = AutoSaver(self.save, interval).start()
+
+    def stop_autosave(self):
+        if self.autosave is not None:
+            self.autosave.stop()
+            self.autosave = None
+
+    # пакетні зміни не пишуться в журнал по одній, і фонове збереження на цей час теж зупиняється,
+    # інакше воно переписувало б усю книгу кожні interval секунд; книгу зберігає dump() після пакета
+    def suspend_journal(self):
+        interval = self.autosave.interval if self.autosave is not None else 0
+        self.stop_autosave()
+        journal, self.journal = self.journal, None
+        return journal, interval
+
+    def resume_journal(self, state):
+        self.journal, interval = state
+        self.start_autosave(interval)
+
+    def load(self, journal=JOURNAL_MODE, autosave=AUTOSAVE_INTERVAL):
+        # знімок + зміни з журналу, якщо попередня сесія завершилась без dump
+        self.data = read_snapshot(BOOK_NAME)
+        self.journal = Journal(BOOK_NAME)
+        self.journal.replay(self.data)
+        self.rebuild_index()
+        if journal:
+            self.journal.open()
+        else:
+            if self.journal.exists():
+                self.dump()
+                self.journal.remove()
+            self.journal = None
+        self.start_autosave(autosave)
 
     def exit(self):
-        result = self.dump()
-        return result
+        self.stop_autosave()
+        self.save()
+        if self.journal is not None:
+            # усі зміни вже в журналі, тож повний запис книги не потрібен
+            self.journal.close()
+        return True
         
 
 # ----------------------------------------------------------------------------------------------------------
 
 
+def open_book(storage=None):
+    storage = storage or BOOK_STORAGE
+    if storage == 'sqlite':
+        from sqlite_book import SQLiteAddressBook
+        book = SQLiteAddressBook()
+    elif storage == 'mapped':
+        from mapped_book import MappedAddressBook
+        book = MappedAddressBook()
+    elif storage == 'columnar':
+        from columnar_book import ColumnarAddressBook
+        book = ColumnarAddressBook()
+    else:
+        book = AddressBook()
+    book.load()
+    return book
+
+
+def run_command(my_book, command, ask=input):
+    # виконує одну команду з реєстру (command_registry.py); значення запитуються через ask -
+    # input() в діалозі або аргументи в пакетному режимі
+    return registry_command(my_book, command, ask)
+
+
 def assistant():
 
+    stats = session()
     my_book = None
-    my_book = AddressBook()
-    my_book.load()
+    my_book = timed(stats, 'load', open_book)
 
     print ('*' * 50)
     print (['Welcome to Assistant-bot'])
@@ -278,201 +776,107 @@ def assistant():
 
     while True:
         
-        result = False
-        
         command = input('Input command or "?" for help: > ').lower().strip()
         
         print('*' * 20, f'{command}', '*' * (28 - len(command)))
 
         if command == "end" or command == "exit":
-            my_book.exit()
+            timed(stats, 'exit', my_book.exit)
+            if stats is not None:
+                stats.dump()
             print ('Bye-Bye!')
             break
-        
-        elif command == 'add_contact':
-            name = input('Input name for contact: ').strip()
-            if name != '':
-                birthday = input('Input bithday in format [yyyy-mm-dd]: ').strip()
-                record = Record(name, birthday)
 
-                my_book.add_record(record)
-                
-                result = True
-
-            else:
-                print("Name can't be empty. Try again.")
-        
-        elif command == 'del_contact':
-            name = input('Input name for contact: ').strip()
-            if name != '':
-                my_book.delete(name)
-                result = True
-
-        elif command == 'add_address':
-            name = input('Input contact name: ').strip()
-            if name != '':
-                record = my_book.find(name)
-                if record:
-                    home = input('Input address: ').strip()
-                    record.home = home
-                    result = True
-                else:
-                    print('Name not found.')
-
-        elif command == 'add_birthday':
-            name = input('Input contact name: ').strip()
-            if name != '':
-                record = my_book.find(name)
-                if record:
-                    birthday = input('Input birthday in format yyyy-mm-dd: ').strip()
-                    record.birthday.value = birthday
-                    result = True
-                else:
-                    print('Name not found.')
-
-        elif command == 'add_email':
-            name = input('Input contact name: ').strip()
-            if name != '':
-                record = my_book.find(name)
-                if record:
-                    email = input('Input email: ').strip()
-                    record.add_email(email)
-                    result = True
-                else:
-                    print('Name not found.')
-        
-        elif command == 'edit_email':
-            name = input('Input contact name: ').strip()
-            if name != '':
-                record = my_book.find(name)
-                if record:
-                    old_email = input('Input old email: ').strip()
-                    new_email = input('Input new email: ').strip()
-                    record.edit_email(old_email, new_email)
-                    result = True
-                else:
-                    print('Name not found.')
-        
-        elif command == 'add_phone':
-            name = input('Input contact name: ').strip()
-            if name != '':
-                record = my_book.find(name)
-                if record:
-                    phone = input('Input phone number: ').strip()
-                    record.add_phone(phone)
-                    result = True
-                else:
-                    print('Name not found.')
-        
-        elif command == 'edit_phone':
-            name = input('Input contact name: ').strip()
-            if name != '':
-                record = my_book.find(name)
-                if record:
-                    old_phone = input('Input old phone number: ').strip()
-                    new_phone = input('Input new phone number: ').strip()
-                    record.edit_phone(old_phone, new_phone)
-                    result = True
-                else:
-                    print('Name not found.')
-
-        elif command == 'find_record':
-            find = input('Input symbols to search: ').strip()
-            if find != '':
-                print(f'-----Search by [{find}]--------')
-                records = my_book.find_record(find)
-                if len(records):
-                    
-                    for name, record in records.items():
-                        print(record)
-                    print('*' * 0)
-                    result = True
-                else:
-                    print('No match found.')
-
-        
-        elif command.startswith('show_birthdays'):
-            days = input('Input max days to birthdays: ')
-            if days.isdigit():
-                days = int(days)
-                if my_book:
-                    for name, record in my_book.data.items():
-                        delta_days = record.days_to_birthday()
-                        if delta_days:
-                            if int(delta_days) < days:
-                                print(record.show_birthday())
-                    result = True
-            else:
-                print('Incorect value of days count')
-
-
-        elif command == 'show_book':
-            if my_book:
-                for name, record in my_book.data.items():
-                    print(record)
-                    result = True
-        
-        elif command == 'scan_folder':
-        
-            folder = input('Input folder name for scaning: ') 
-
-            if os.path.exists(folder):
-                folder = Path(folder)
-                scan.scan(folder)
-                scan.scan_result()
-                result = True
-            else:
-                print ('Folder not found')
-
-        elif command == 'sort_folder':
-            
-            folder = input('Input folder name for sorting: ') 
-
-            if os.path.exists(folder):
-                folder = Path(folder)
-                sort.main(folder)
-                result = True
-            else:
-                print('Error sorting files')
-
-        elif command == 'notes':
-            notes.main()
-
-        elif command == "?":
-            commands = []
-            
-            commands.append('- [end] or [exit]  - quit program')
-            
-            commands.append('- [add_contact]    - adding contact to book')
-            commands.append('- [del_contact]    - remove contact from book')
-            commands.append('- [add_address]    - adding address to contact')
-            commands.append('- [add_birthday]   - adding birthday to contact')
-            commands.append('- [add_email]      - adding email to contact')
-            commands.append('- [edit_email]     - edit email')
-            commands.append('- [add_phone]      - adding phone number to contact')
-            commands.append('- [edit_phone]     - edit phone number')
-            commands.append('- [find_record]    - search contact by symbols')
-
-            commands.append('- [show_birthdays] - show all birtdays in book')
-            commands.append('- [show_book]      - show all contacts in book')
-            
-            commands.append('- [scan_folder]    - scan folder')
-            commands.append('- [sort_folder]    - sort folder')
-            commands.append('- [notes]          - case of notes')
-
-            
-            for c in commands:
-                print(f'{c}')
+        if stats is None:
+            result = run_command(my_book, command)
+        else:
+            # гістограма - на команду з реєстру, а не на кожен введений рядок
+            name = command if command in COMMANDS else 'unknown'
+            result = stats.time(name, run_command, my_book, command, stats.ask)
         
         print('*' * 50)
         if result:
             print('Result: OK')
-        
+
+
+def parse_batch_line(line):
+    # "команда аргумент 'аргумент з пробілами'" або JSON: {"command": ..., "args": [...]} чи [команда, аргументи...]
+    line = line.strip()
+    if line.startswith('{'):
+        item = json.loads(line)
+        return item['command'], [str(arg) for arg in item.get('args', [])]
+    if line.startswith('['):
+        item = json.loads(line)
+        return item[0], [str(arg) for arg in item[1:]]
+    parts = shlex.split(line)
+    return parts[0], parts[1:]
+
+
+def run_batch(lines, my_book=None):
+    # команди виконуються без запитів, а книга зберігається один раз наприкінці
+    my_book = my_book or open_book()
+    suspended = my_book.suspend_journal()
+    done = failed = 0
+    try:
+        for number, line in enumerate(lines, start=1):
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            try:
+                command, args = parse_batch_line(line)
+            except (ValueError, KeyError, IndexError) as error:
+                print(f'[{number}] invalid line: {error}')
+                failed += 1
+                continue
+            command = command.lower().strip()
+            if command in ('end', 'exit'):
+                break
+            values = iter(args)
+            try:
+                result = run_command(my_book, command, lambda prompt='': next(values, ''))
+            except Exception as error:
+                print(f'[{number}] {command}: ERROR {error}')
+                failed += 1
+                continue
+            print(f'[{number}] {command}: {"OK" if result else "FAILED"}')
+            if result:
+                done += 1
+            else:
+                failed += 1
+    finally:
+        my_book.resume_journal(suspended)
+        if my_book.journal is not None:
+            my_book.dump()
+        my_book.exit()
+    print(f'Batch finished: {done} OK, {failed} failed')
+    return done, failed
+
+
+def main(argv):
+    # python contact.py --batch commands.txt (або "-" для stdin)
+    # python contact.py --serve [127.0.0.1:8765 | unix:/tmp/book.sock], --connect - клієнт до нього
+    if len(argv) > 1 and argv[1] in ('--serve', '--connect'):
+        import book_server
+        address = argv[2] if len(argv) > 2 else book_server.SERVER_ADDRESS
+        if argv[1] == '--serve':
+            book_server.serve(address)
+        else:
+            book_server.client(address)
+    elif len(argv) > 2 and argv[1] == '--batch':
+        if argv[2] == '-':
+            run_batch(sys.stdin)
+        else:
+            with open(argv[2], encoding='utf-8') as file:
+                run_batch(file)
+    else:
+        # python contact.py --stats - заміри затримки команд, звіт у latency.json при виході
+        assistant()
 
 
 if __name__ == "__main__":
-    
-    assistant()
+    # працюємо через імпортований модуль contact: інакше записи збереглися б у pickle як __main__.Record,
+    # і книгу не змогли б прочитати exporter.py, сервер та інші точки входу
+    import contact
+    contact.main(sys.argv)
 # name = Name('Liza')
 # phone = Phone('0608475176')
 # birthday = Birthday('12.01.2006')
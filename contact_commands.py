@@ -0,0 +1,229 @@
+import os
+
+from contact import Record, Name, Birthday, PAGE_SIZE, FUZZY_DISTANCE, parse_birthday
+
+# обробники команд книги контактів: (книга, ask) -> True, якщо команда виконана;
+# значення запитуються через ask - input() в діалозі або аргументи в пакетному режимі
+
+
+def add_contact(my_book, ask):
+    name = ask('Input name for contact: ').strip()
+    if name != '':
+        birthday = ask('Input bithday in format [yyyy-mm-dd]: ').strip()
+        record = Record(Name(name), birthday=Birthday(birthday or None))
+        my_book.add_record(record)
+        return True
+    print("Name can't be empty. Try again.")
+    return False
+
+
+def del_contact(my_book, ask):
+    name = ask('Input name for contact: ').strip()
+    if name != '':
+        my_book.delete(name)
+        return True
+    return False
+
+
+def find_contact(my_book, ask):
+    # спільний перший крок команд, що змінюють один контакт
+    name = ask('Input contact name: ').strip()
+    if name == '':
+        return None
+    record = my_book.find(name)
+    if not record:
+        print('Name not found.')
+    return record
+
+
+def add_address(my_book, ask):
+    record = find_contact(my_book, ask)
+    if record:
+        home = ask('Input address: ').strip()
+        record.set_address(home)
+        return True
+    return False
+
+
+def add_birthday(my_book, ask):
+    record = find_contact(my_book, ask)
+    if record:
+        birthday = ask('Input birthday in format yyyy-mm-dd: ').strip()
+        record.set_birthday(birthday)
+        return True
+    return False
+
+
+def add_email(my_book, ask):
+    record = find_contact(my_book, ask)
+    if record:
+        email = ask('Input email: ').strip()
+        record.add_email(email)
+        return True
+    return False
+
+
+def edit_email(my_book, ask):
+    record = find_contact(my_book, ask)
+    if record:
+        old_email = ask('Input old email: ').strip()
+        new_email = ask('Input new email: ').strip()
+        record.edit_email(old_email, new_email)
+        return True
+    return False
+
+
+def add_phone(my_book, ask):
+    record = find_contact(my_book, ask)
+    if record:
+        phone = ask('Input phone number: ').strip()
+        record.add_phone(phone)
+        return True
+    return False
+
+
+def edit_phone(my_book, ask):
+    record = find_contact(my_book, ask)
+    if record:
+        old_phone = ask('Input old phone number: ').strip()
+        new_phone = ask('Input new phone number: ').strip()
+        record.edit_phone(old_phone, new_phone)
+        return True
+    return False
+
+
+def print_found(records):
+    for record in records.values():
+        print(record)
+    if records:
+        return True
+    print('No match found.')
+    return False
+
+
+def find_record(my_book, ask):
+    find = ask('Input symbols to search: ').strip()
+    if find == '':
+        return False
+    print(f'-----Search by [{find}]--------')
+    records = my_book.find_record(find)
+    if len(records):
+        for name, record in records.items():
+            print(record)
+        return True
+    print('No match found.')
+    similar = my_book.suggest_names(find)
+    if similar:
+        print('Did you mean: ' + ', '.join(record.get_name() for record, _ in similar))
+    return False
+
+
+def find_fuzzy(my_book, ask):
+    find = ask('Input name to search: ').strip()
+    if find == '':
+        return False
+    distance = ask(f'Input max number of typos [{FUZZY_DISTANCE}]: ').strip()
+    distance = int(distance) if distance.isdigit() else FUZZY_DISTANCE
+    print(f'-----Fuzzy search by [{find}]--------')
+    found = my_book.find_fuzzy(find, distance)
+    for record, typos in found:
+        print(f'{typos} | {record}')
+    if found:
+        return True
+    print('No match found.')
+    return False
+
+
+def find_prefix(my_book, ask):
+    prefix = ask('Input first letters of name: ').strip()
+    if prefix == '':
+        return False
+    return print_found(my_book.find_prefix('name', prefix))
+
+
+def find_city(my_book, ask):
+    city = ask('Input city: ').strip()
+    if city == '':
+        return False
+    return print_found(my_book.find_city(city))
+
+
+def find_born(my_book, ask):
+    low = parse_birthday(ask('Input first birth date in format yyyy-mm-dd: ').strip())
+    high = parse_birthday(ask('Input last birth date in format yyyy-mm-dd: ').strip())
+    if low and high:
+        records = my_book.find_range('birthday', low, high)
+        for record in records.values():
+            print(f'{record.get_name()}: {record.birthday_date()}')
+        return True
+    print('Incorrect date')
+    return False
+
+
+def dedupe(my_book, ask):
+    from dedupe import find_duplicates, merge_duplicates
+    by_name = ask('Match similar names too? [Y/n]: ').strip().lower() != 'n'
+    clusters = find_duplicates(my_book, by_name)
+    for names in clusters[:PAGE_SIZE]:
+        print(' + '.join(names))
+    if len(clusters) > PAGE_SIZE:
+        print(f'... and {len(clusters) - PAGE_SIZE} more')
+    print(f'Found {len(clusters)} groups of duplicates')
+    if clusters and ask('Merge them? [y/N]: ').strip().lower() == 'y':
+        merged = merge_duplicates(my_book, clusters)
+        print(f'Merged into {len(merged)} contacts')
+    return True
+
+
+def show_birthdays(my_book, ask):
+    days = ask('Input max days to birthdays: ')
+    if not days.isdigit():
+        print('Incorect value of days count')
+        return False
+    if not my_book:
+        return False
+    for record, delta_days in my_book.upcoming_birthdays(int(days)):
+        print(f'{record.get_name()}: {record.birthday_date()} (in {delta_days} days)')
+    return True
+
+
+def show_book(my_book, ask):
+    # сторінки запитуються по одній, лише коли користувач хоче наступну
+    result = False
+    cursor = None
+    while my_book:
+        records, cursor = my_book.page(cursor)
+        for record in records:
+            print(record)
+        result = True
+        if cursor is None or ask('Press Enter for next page or "q" to stop: ').strip().lower() == 'q':
+            break
+    return result
+
+
+def import_contacts(my_book, ask):
+    path = ask('Input path to CSV or vCard file: ').strip()
+    if not os.path.exists(path):
+        print('File not found')
+        return False
+    import importer
+    imported, rejected, seconds = importer.import_contacts(my_book, path)
+    print(f'Imported {imported} contacts, rejected {rejected} '
+          f'({(imported + rejected) / max(seconds, 1e-9):.0f} rows per second)')
+    if rejected:
+        print(f'Rejected rows are saved to {path}.errors.csv')
+    return True
+
+
+def export_contacts(my_book, ask):
+    form = ask('Input format [jsonl / csv / vcard]: ').strip().lower() or 'jsonl'
+    path = ask('Input output file name (empty for screen): ').strip() or '-'
+    part = ask('Only names containing (empty for all): ').strip() or None
+    days = ask('Only birthdays in next N days (empty for all): ').strip()
+    import exporter
+    if form not in exporter.FORMATS:
+        print('Unknown format')
+        return False
+    count = exporter.export_contacts(my_book, path, form, part, int(days) if days.isdigit() else None)
+    print(f'Exported {count} contacts')
+    return True
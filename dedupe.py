@@ -0,0 +1,134 @@
+import re
+
+from contact import ContactFormatterInfo, Address, check_phone
+
+# варіанти транслітерації, які дають різні написання одного імені
+NAME_FOLDS = (('kh', 'h'), ('ks', 'x'), ('zh', 'z'), ('ts', 'c'), ('ph', 'f'), ('w', 'v'),
+              ('y', 'i'), ('j', 'i'))
+REPEATS = re.compile(r'(.)\1+')
+NOT_WORDS = re.compile(r'[\W_]+')
+
+
+def name_key(name):
+    # "Petrenko  Olexandr" і "Oleksandr Petrenko" дають однаковий ключ
+    key = NOT_WORDS.sub(' ', name.lower())
+    for old, new in NAME_FOLDS:
+        key = key.replace(old, new)
+    key = REPEATS.sub(r'\1', key)
+    return ' '.join(sorted(key.split()))
+
+
+def record_phones(record):
+    phones = list(record.phones)
+    if isinstance(record.phone, ContactFormatterInfo):
+        phones.append(record.phone.value_of())
+    for phone in phones:
+        normalized, _ = check_phone(str(phone))
+        yield normalized or str(phone)
+
+
+def blocking_keys(name, record, by_name=True):
+    # контакти з однаковим ключем - кандидати в дублікати
+    for phone in record_phones(record):
+        yield 'p' + phone
+    for email in record.emails:
+        yield 'e' + email.strip().lower()
+    if by_name:
+        key = name_key(name)
+        if key:
+            yield 'n' + key
+
+
+class UnionFind:
+    # об'єднання множин зі стисненням шляху; елементи - номери записів
+    def __init__(self):
+        self.parent = []
+
+    def add(self):
+        self.parent.append(len(self.parent))
+        return len(self.parent) - 1
+
+    def find(self, item):
+        parent = self.parent
+        root = item
+        while parent[root] != root:
+            root = parent[root]
+        while parent[item] != root:
+            parent[item], item = root, parent[item]
+        return root
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            # менший номер стає коренем, тож кластер тримається першого запису
+            if a < b:
+                self.parent[b] = a
+            else:
+                self.parent[a] = b
+
+
+def find_duplicates(book, by_name=True):
+    # один прохід по книзі: перший запис з кожним ключем запам'ятовується, наступні з'єднуються з ним;
+    # попарного порівняння записів немає
+    names = []
+    sets = UnionFind()
+    first = {}
+    for record in book.stream_records():
+        name = record.get_name()
+        item = sets.add()
+        names.append(name)
+        for key in blocking_keys(name, record, by_name):
+            owner = first.setdefault(key, item)
+            if owner != item:
+                sets.union(item, owner)
+    first.clear()
+    clusters = {}
+    for item in range(len(names)):
+        root = sets.find(item)
+        if root != item:
+            clusters.setdefault(root, [names[root]]).append(names[item])
+    return sorted(clusters.values())
+
+
+def merge_key(record):
+    return -(len(record.phones) + len(record.emails)), record.get_name()
+
+
+def has_address(address):
+    if isinstance(address, Address):
+        return any(part not in (None, '') for part in (address.country, address.city, address.street, address.house))
+    return bool(address)
+
+
+def merge_cluster(book, names):
+    # залишається запис з найбільшою кількістю телефонів і адрес, решта зливаються в нього
+    records = sorted((book[name] for name in names), key=merge_key)
+    main = records[0]
+    phones = list(main.phones)
+    emails = list(main.emails)
+    for record in records[1:]:
+        phones.extend(record_phones(record))
+        emails.extend(record.emails)
+        # Birthday(None) і порожня Address - теж об'єкти, тож перевіряємо значення, а не сам об'єкт
+        if not has_address(main.address) and has_address(record.address):
+            main.address = record.address
+        if main.birthday_date() is None and record.birthday_date() is not None:
+            main.birthday = record.birthday
+    main.phones = tuple(dict.fromkeys(phones))
+    main.emails = tuple(dict.fromkeys(emails))
+    for record in records[1:]:
+        del book[record.get_name()]
+    main.changed()
+    return main
+
+
+def merge_duplicates(book, clusters):
+    # зміни не пишуться в журнал по одній: книга зберігається один раз після всіх злиттів
+    suspended = book.suspend_journal()
+    try:
+        merged = [merge_cluster(book, names) for names in clusters]
+    finally:
+        book.resume_journal(suspended)
+    if merged:
+        book.dump()
+    return merged
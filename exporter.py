@@ -0,0 +1,145 @@
+import argparse
+import csv
+import json
+import sys
+
+from contact import Address, open_book
+
+CHUNK_SIZE = 64 * 1024
+CSV_FIELDS = ['name', 'phones', 'emails', 'birthday', 'country', 'city', 'street', 'house']
+
+
+def record_to_dict(record):
+    birthday = record.birthday_date()
+    address = record.address
+    if isinstance(address, Address):
+        country, city, street, house = address.country, address.city, address.street, address.house
+    else:
+        country, city, street, house = '', address or '', '', ''
+    return {'name': record.get_name(),
+            'phones': list(record.phones),
+            'emails': list(record.emails),
+            'birthday': birthday.isoformat() if birthday else None,
+            'country': country,
+            'city': city,
+            'street': street,
+            'house': house}
+
+
+def jsonl_lines(records):
+    for record in records:
+        yield json.dumps(record_to_dict(record), ensure_ascii=False) + '\n'
+
+
+class LineBuffer:
+    # csv.writer пише сюди один рядок, який одразу забираємо
+    def __init__(self):
+        self.line = ''
+
+    def write(self, line):
+        self.line = line
+
+
+def csv_lines(records):
+    buffer = LineBuffer()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(CSV_FIELDS)
+    yield buffer.line
+    for record in records:
+        row = record_to_dict(record)
+        row['phones'] = ';'.join(row['phones'])
+        row['emails'] = ';'.join(row['emails'])
+        writer.writerow([row[field] or '' for field in CSV_FIELDS])
+        yield buffer.line
+
+
+def vcard_escape(value):
+    return str(value).replace('\\', '\\\\').replace(',', '\\,').replace(';', '\\;').replace('\n', '\\n')
+
+
+def vcard_lines(records):
+    for record in records:
+        row = record_to_dict(record)
+        lines = ['BEGIN:VCARD', 'VERSION:3.0', f'FN:{vcard_escape(row["name"])}']
+        lines += [f'TEL;TYPE=cell:{phone}' for phone in row['phones']]
+        lines += [f'EMAIL:{email}' for email in row['emails']]
+        if row['birthday']:
+            lines.append(f'BDAY:{row["birthday"]}')
+        # окремого поля для номера будинку у vCard немає, тож він пишеться у вулицю: "Хрещатик 22"
+        street = ' '.join(str(part) for part in (row['street'], row['house']) if part not in ('', None))
+        if row['country'] or row['city'] or street:
+            lines.append(f'ADR:;;{vcard_escape(street)};{vcard_escape(row["city"])};;;{vcard_escape(row["country"])}')
+        lines.append('END:VCARD')
+        yield '\r\n'.join(lines) + '\r\n'
+
+
+FORMATS = {'jsonl': jsonl_lines, 'csv': csv_lines, 'vcard': vcard_lines}
+
+
+def chunked(lines, size=CHUNK_SIZE):
+    # рядки збираються в шматки фіксованого розміру, тож у пам'яті не більше одного шматка
+    chunk = []
+    length = 0
+    for line in lines:
+        chunk.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(chunk)
+            chunk = []
+            length = 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+def select_records(book, part=None, days=None):
+    # фільтри використовують пошук книги: підрядок імені та вікно днів народження
+    if part is None and days is None:
+        return book.stream_records()
+    if part is not None:
+        records = {name: record for name, record in book.find_record(part).items()
+                   if part.lower() in name.lower()}
+    if days is not None:
+        upcoming = {record.get_name(): record for record, _ in book.upcoming_birthdays(days)}
+        records = upcoming if part is None else {name: records[name] for name in records if name in upcoming}
+    return records.values()
+
+
+def export_contacts(book, path='-', form='jsonl', part=None, days=None):
+    counter = {'records': 0}
+
+    def counted(records):
+        for record in records:
+            counter['records'] += 1
+            yield record
+
+    lines = FORMATS[form](counted(select_records(book, part, days)))
+    if path == '-':
+        for chunk in chunked(lines):
+            sys.stdout.write(chunk)
+        sys.stdout.flush()
+    else:
+        newline = '' if form == 'vcard' else None
+        with open(path, 'w', encoding='utf-8', newline=newline) as file:
+            for chunk in chunked(lines):
+                file.write(chunk)
+    return counter['records']
+
+
+def main():
+    # python exporter.py jsonl --name Ol --days 30 contacts.jsonl
+    parser = argparse.ArgumentParser(description='Export the address book')
+    parser.add_argument('format', choices=sorted(FORMATS))
+    parser.add_argument('output', nargs='?', default='-', help='output file, "-" for stdout')
+    parser.add_argument('--name', help='only contacts whose name contains this text')
+    parser.add_argument('--days', type=int, help='only contacts with a birthday in the next N days')
+    args = parser.parse_args()
+    book = open_book()
+    try:
+        count = export_contacts(book, args.output, args.format, args.name, args.days)
+    finally:
+        book.exit()
+    print(f'Exported {count} contacts', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
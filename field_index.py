@@ -0,0 +1,146 @@
+from bisect import bisect_left, bisect_right, insort
+from operator import itemgetter
+
+first = itemgetter(0)
+
+
+def normalize_value(value):
+    if isinstance(value, str):
+        value = value.strip().lower()
+    return value if value not in ('', None) else None
+
+
+def address_part(part):
+    def getter(name, record):
+        address = record.address
+        if isinstance(address, str):
+            # адреса, введена одним рядком, вважається містом
+            return (address,) if part == 'city' else ()
+        return (getattr(address, part, None),)
+    return getter
+
+
+# поля запису, за якими можна оголосити індекс: функція повертає значення поля для запису
+FIELDS = {
+    'name': lambda name, record: (name,),
+    'phone': lambda name, record: record.phones,
+    'email': lambda name, record: record.emails,
+    'birthday': lambda name, record: (record.birthday_date(),),
+    'country': address_part('country'),
+    'city': address_part('city'),
+    'street': address_part('street'),
+}
+
+
+def field_values(field, name, record):
+    if field not in FIELDS:
+        raise KeyError(f'Unknown field: {field}')
+    values = (normalize_value(value) for value in FIELDS[field](name, record))
+    return tuple({value for value in values if value is not None})
+
+
+def prefix_end(prefix):
+    # перший рядок, більший за всі рядки з цим префіксом
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class HashIndex:
+    # значення -> імена; лише пошук за точним значенням
+    def __init__(self):
+        self.buckets = {}
+        self.keys = {}
+
+    def add(self, name, values):
+        self.discard(name)
+        self.keys[name] = values
+        for value in values:
+            self.buckets.setdefault(value, set()).add(name)
+
+    def discard(self, name):
+        for value in self.keys.pop(name, ()):
+            bucket = self.buckets[value]
+            bucket.discard(name)
+            if not bucket:
+                del self.buckets[value]
+
+    def clear(self):
+        self.buckets.clear()
+        self.keys.clear()
+
+    def get(self, value):
+        return sorted(self.buckets.get(value, ()))
+
+    def estimate(self, value):
+        return len(self.buckets.get(value, ()))
+
+
+class SortedIndex:
+    # впорядкований список пар (значення, ім'я): точний пошук, діапазони і префікси через bisect
+    def __init__(self):
+        self.items = []
+        self.keys = {}
+        # після clear() пари лише дописуються, а список сортується один раз при першому запиті
+        self.ordered = True
+
+    def order(self):
+        if not self.ordered:
+            self.items.sort()
+            self.ordered = True
+
+    def add(self, name, values):
+        self.discard(name)
+        self.keys[name] = values
+        for value in values:
+            if self.ordered:
+                insort(self.items, (value, name))
+            else:
+                self.items.append((value, name))
+
+    def discard(self, name):
+        values = self.keys.pop(name, ())
+        if values:
+            self.order()
+        for value in values:
+            i = bisect_left(self.items, (value, name))
+            if i < len(self.items) and self.items[i] == (value, name):
+                del self.items[i]
+
+    def clear(self):
+        self.items.clear()
+        self.keys.clear()
+        self.ordered = False
+
+    def slice(self, start, end):
+        # ім'я з кількома значеннями в діапазоні повертається один раз
+        return list(dict.fromkeys(name for _, name in self.items[start:end]))
+
+    def get(self, value):
+        return self.range(value, value)
+
+    def range(self, low=None, high=None):
+        # low <= значення <= high, None - без межі
+        self.order()
+        start = 0 if low is None else bisect_left(self.items, low, key=first)
+        end = len(self.items) if high is None else bisect_right(self.items, high, key=first)
+        return self.slice(start, end)
+
+    def prefix_bounds(self, prefix):
+        self.order()
+        if not prefix:
+            return 0, len(self.items)
+        return bisect_left(self.items, prefix, key=first), bisect_left(self.items, prefix_end(prefix), key=first)
+
+    def prefix(self, prefix):
+        return self.slice(*self.prefix_bounds(prefix))
+
+    # оцінки для планувальника запитів: кількість пар без побудови списку імен
+    def estimate(self, value):
+        self.order()
+        return bisect_right(self.items, value, key=first) - bisect_left(self.items, value, key=first)
+
+    def estimate_prefix(self, prefix):
+        start, end = self.prefix_bounds(prefix)
+        return end - start
+
+
+INDEX_KINDS = {'hash': HashIndex, 'sorted': SortedIndex}
@@ -0,0 +1,142 @@
+import heapq
+import re
+from collections import defaultdict
+
+FUZZY_DISTANCE = 2
+FUZZY_LIMIT = 10
+# підказки "Did you mean" при невдалому пошуку; у більшій книзі - лише якщо нечіткий індекс уже побудовано
+FUZZY_SUGGESTIONS = 5
+FUZZY_SUGGEST_MAX = 10_000
+WORD = re.compile(r'\w+')
+
+
+def words_of(name):
+    return tuple(dict.fromkeys(WORD.findall(name.lower())))
+
+
+def deletes(word, distance):
+    # усі варіанти слова без щонайбільше distance літер (symmetric delete, як у SymSpell)
+    result = {word}
+    level = {word}
+    for _ in range(distance):
+        level = {item[:i] + item[i + 1:] for item in level if len(item) > 1 for i in range(len(item))}
+        result |= level
+    return result
+
+
+def edit_distance(a, b, limit):
+    # відстань Дамерау-Левенштейна (перестановка сусідніх літер - одна правка);
+    # якщо вона більша за limit, повертається limit + 1
+    if a == b:
+        return 0
+    # спільні початок і кінець не впливають на відстань
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), len(b)
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a, b = a[start:end_a], b[start:end_b]
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if not a or not b:
+        return len(a) + len(b)
+    previous = None
+    row = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        char = a[i - 1]
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            value = row[j - 1] if char == b[j - 1] else min(row[j], current[j - 1], row[j - 1]) + 1
+            if previous is not None and j > 1 and char == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return limit + 1
+        previous, row = row, current
+    return min(row[-1], limit + 1)
+
+
+class FuzzyIndex:
+    # нечіткий пошук імен: слово -> ключі записів, варіант без кількох літер -> слова.
+    # слова запиту та індексу на відстані не більше max_distance мають спільний варіант,
+    # тож перевіряється лише кілька слів, а не вся книга
+    def __init__(self, max_distance=FUZZY_DISTANCE):
+        self.max_distance = max_distance
+        self.words = defaultdict(set)
+        self.variants = defaultdict(set)
+        self.names = {}
+
+    def add(self, key, name=None):
+        words = words_of(key if name is None else name)
+        if self.names.get(key) == words:
+            return
+        self.discard(key)
+        self.names[key] = words
+        for word in words:
+            keys = self.words[word]
+            if not keys:
+                for variant in deletes(word, self.max_distance):
+                    self.variants[variant].add(word)
+            keys.add(key)
+
+    def discard(self, key):
+        words = self.names.pop(key, None)
+        if words is None:
+            return
+        for word in words:
+            keys = self.words[word]
+            keys.discard(key)
+            if not keys:
+                del self.words[word]
+                for variant in deletes(word, self.max_distance):
+                    owners = self.variants.get(variant)
+                    if owners is not None:
+                        owners.discard(word)
+                        if not owners:
+                            del self.variants[variant]
+
+    def clear(self):
+        self.words.clear()
+        self.variants.clear()
+        self.names.clear()
+
+    def similar_words(self, word, distance):
+        # слова індексу на відстані не більше distance: {слово: відстань}
+        result = {}
+        for variant in deletes(word, distance):
+            for candidate in self.variants.get(variant, ()):
+                if candidate not in result:
+                    result[candidate] = edit_distance(word, candidate, distance)
+        return {candidate: value for candidate, value in result.items() if value <= distance}
+
+    def search(self, query, distance=None, limit=FUZZY_LIMIT):
+        # ключі, кожне слово запиту в яких знайдено з правками, разом не більше distance;
+        # повертає пари (ключ, відстань), найближчі першими
+        distance = self.max_distance if distance is None else min(distance, self.max_distance)
+        matches = [self.similar_words(word, distance) for word in words_of(query)]
+        if not matches or not all(matches):
+            return []
+        # комбінації слів індексу з сумою правок не більше distance: (ключі з усіма словами, правки);
+        # перетин множин рахується лише для комбінацій, що вкладаються в бюджет
+        matches.sort(key=len)
+        groups = [(self.words[word], value) for word, value in matches[0].items()]
+        for found in matches[1:]:
+            groups = [(common, total + value)
+                      for keys, total in groups
+                      for word, value in found.items() if total + value <= distance
+                      for common in (keys & self.words[word],) if common]
+        # від найменшої кількості правок; далі не йдемо, коли вже набрано limit ключів
+        groups.sort(key=lambda group: group[1])
+        scores = {}
+        for i, (keys, value) in enumerate(groups):
+            if len(scores) >= limit and value > groups[i - 1][1]:
+                break
+            for key in keys:
+                if key not in scores:
+                    scores[key] = value
+        return heapq.nsmallest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+
+    def __len__(self):
+        return len(self.names)
@@ -0,0 +1,205 @@
+import csv
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from contact import Record, Name, Address, Birthday, check_phone, check_email
+
+CHUNK_SIZE = 5000
+VCARD_EXTENSIONS = ('.vcf', '.vcard')
+# номер будинку в кінці вулиці ADR: "Хрещатик 22", "Шевченка 5/2", "Миру 10а"
+HOUSE_AT_END = re.compile(r'^(?:(?P<street>.*?)[\s,]+)?(?P<house>\d[\w/-]*)$')
+
+
+def split_values(value):
+    if not value:
+        return []
+    return [item.strip() for item in value.split(';') if item.strip()]
+
+
+def read_csv(path):
+    # колонки: name, phones, emails, birthday, country, city, street, house; кілька значень через ';'
+    with open(path, newline='', encoding='utf-8') as file:
+        for number, row in enumerate(csv.DictReader(file), start=2):
+            row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+            address = [row.get(key, '') for key in ('country', 'city', 'street', 'house')]
+            yield number, {'name': row.get('name', ''),
+                           'phones': split_values(row.get('phones') or row.get('phone')),
+                           'emails': split_values(row.get('emails') or row.get('email')),
+                           'birthday': row.get('birthday') or None,
+                           'address': address if any(address) else None}
+
+
+def vcard_unescape(value):
+    return re.sub(r'\\(.)', lambda match: '\n' if match.group(1) in 'nN' else match.group(1), value.strip())
+
+
+def vcard_split(value):
+    # поля ADR та N розділені ';', але екранований '\;' - частина значення
+    return [vcard_unescape(part) for part in re.split(r'(?<!\\);', value)]
+
+
+def split_street(value):
+    # (вулиця, будинок) з поля вулиці ADR, куди exporter.py дописує номер будинку
+    match = HOUSE_AT_END.match(value)
+    if match is None:
+        return value, ''
+    return match['street'] or '', match['house']
+
+
+def unfold_lines(file):
+    # рядки vCard, що починаються з пробілу чи табуляції, продовжують попередній
+    current = None
+    for number, line in enumerate(file, start=1):
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current[1] += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = [number, line]
+    if current is not None:
+        yield current
+
+
+def read_vcard(path):
+    with open(path, encoding='utf-8') as file:
+        card = None
+        for number, line in unfold_lines(file):
+            key, _, value = line.partition(':')
+            key = key.split(';')[0].upper()
+            if key == 'BEGIN' and value.upper() == 'VCARD':
+                card = [number, {'name': '', 'phones': [], 'emails': [], 'birthday': None, 'address': None}]
+            elif card is None:
+                continue
+            elif key == 'END':
+                yield card
+                card = None
+            elif key == 'FN':
+                card[1]['name'] = vcard_unescape(value)
+            elif key == 'N' and not card[1]['name']:
+                parts = [part for part in vcard_split(value)[:2] if part]
+                card[1]['name'] = ' '.join(reversed(parts))
+            elif key == 'TEL':
+                card[1]['phones'].append(value.strip())
+            elif key == 'EMAIL':
+                card[1]['emails'].append(value.strip())
+            elif key == 'BDAY':
+                value = value.strip()
+                if len(value) == 8 and value.isdigit():
+                    value = f'{value[:4]}-{value[4:6]}-{value[6:]}'
+                card[1]['birthday'] = value
+            elif key == 'ADR':
+                # поштова скринька; доп. адреса; вулиця; місто; регіон; індекс; країна
+                parts = (vcard_split(value) + [''] * 7)[:7]
+                card[1]['address'] = [parts[6], parts[3], *split_street(parts[2])]
+
+
+def read_contacts(path):
+    if path.lower().endswith(VCARD_EXTENSIONS):
+        return read_vcard(path)
+    return read_csv(path)
+
+
+def validate_row(row):
+    name = row['name']
+    if len(name) < 2:
+        return None, 'Invalid name! Please enter a name with at least 2 symbols'
+    phones = []
+    for raw in row['phones']:
+        phone, error = check_phone(raw)
+        if phone is None:
+            return None, f'{raw}: {error or "Invalid phone number!"}'
+        phones.append(phone)
+    emails = []
+    for raw in row['emails']:
+        email, error = check_email(raw)
+        if email is None:
+            return None, f'{raw}: {error}'
+        emails.append(email)
+    birthday = row['birthday']
+    if birthday and Birthday(birthday).value_of() is None:
+        return None, f'{birthday}: Invalid birthday! Please use format yyyy-mm-dd'
+    return {'name': name,
+            'phones': tuple(dict.fromkeys(phones)),
+            'emails': tuple(dict.fromkeys(emails)),
+            'birthday': birthday,
+            'address': row['address']}, None
+
+
+ERROR_FIELDS = ['line', 'name', 'phones', 'emails', 'birthday', 'country', 'city', 'street', 'house', 'error']
+
+
+def error_row(number, row, error):
+    # вихідний рядок у колонках read_csv, тож виправлений файл помилок можна імпортувати знову
+    address = row['address'] or [''] * 4
+    return [number, row['name'], ';'.join(row['phones']), ';'.join(row['emails']), row['birthday'] or '',
+            *address, error]
+
+
+def validate_chunk(chunk):
+    return [(number, row, *validate_row(row)) for number, row in chunk]
+
+
+def build_record(contact):
+    address = contact['address']
+    record = Record(Name(contact['name']),
+                    address=Address(*address) if address else None,
+                    birthday=Birthday(contact['birthday']) if contact['birthday'] else None)
+    record.phones = contact['phones']
+    record.emails = contact['emails']
+    return record
+
+
+def chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def validated_chunks(rows, workers, chunk_size):
+    # у процесах перевіряється не більше двох пачок на процес, тож файл не читається в пам'ять цілком
+    if workers <= 1:
+        for chunk in chunks(rows, chunk_size):
+            yield validate_chunk(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks(rows, chunk_size):
+            pending.append(pool.submit(validate_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def import_contacts(book, path, errors_path=None, workers=None, chunk_size=CHUNK_SIZE):
+    # повертає (кількість імпортованих, кількість відхилених, секунди)
+    errors_path = errors_path or path + '.errors.csv'
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    rejected = 0
+
+    def records(errors):
+        nonlocal rejected
+        for results in validated_chunks(read_contacts(path), workers, chunk_size):
+            for number, row, contact, error in results:
+                if contact is None:
+                    rejected += 1
+                    errors.writerow(error_row(number, row, error))
+                else:
+                    yield build_record(contact)
+
+    with open(errors_path, 'w', newline='', encoding='utf-8') as errors_file:
+        errors = csv.writer(errors_file)
+        errors.writerow(ERROR_FIELDS)
+        imported = book.add_records(records(errors))
+    if not rejected:
+        os.remove(errors_path)
+    return imported, rejected, time.perf_counter() - start
@@ -0,0 +1,200 @@
+import os
+import pickle
+from threading import Thread, Lock, Event
+
+from book_file import is_book_file, read_book_file
+
+JOURNAL_LIMIT = 10000
+# секунд між фоновими збереженнями книги; 0 - кожна зміна одразу дописується в журнал.
+# з автозбереженням команда не чекає на диск, але зміни за останні interval секунд можуть загубитись при збої
+AUTOSAVE_INTERVAL = 0
+
+
+def read_snapshot(path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return {}
+    if is_book_file(path):
+        return read_book_file(path)
+    with open(path, 'rb') as file:
+        book = pickle.load(file)
+    # старі файли містять збережену AddressBook, нові - лише словник записів
+    return getattr(book, 'data', book)
+
+
+def write_snapshot(path, data):
+    # тимчасовий файл + fsync + перейменування: на диску завжди або старий, або новий знімок цілком
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as file:
+        pickle.dump(data, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp, path)
+
+
+def read_entries(path):
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as file:
+        while True:
+            try:
+                yield pickle.load(file)
+            except EOFError:
+                return
+            except (pickle.UnpicklingError, ValueError, AttributeError, IndexError):
+                # недописаний останній запис після аварійного завершення
+                return
+
+
+def apply_entry(data, entry):
+    action, name, record = entry
+    if action == 'set':
+        data[name] = record
+    elif action == 'del':
+        data.pop(name, None)
+
+
+class Journal:
+    # журнал змін книги: кожна зміна дописується в кінець файлу, знімок оновлюється у фоні
+    # replace - функція, що підміняє знімок файлом, злитим у фоні: тоді фоновий потік лише пише новий файл,
+    # а підміняє його власник книги викликом swap() там, де файл ніхто не читає
+    def __init__(self, snapshot, path=None, limit=JOURNAL_LIMIT, sync=True, read=read_snapshot, write=None,
+                 replace=None):
+        self.snapshot = snapshot
+        self.read = read
+        self.write = write or self.write_snapshot
+        self.path = path or snapshot + '.log'
+        self.old_path = self.path + '.old'
+        self.limit = limit
+        self.sync = sync
+        self.replace = replace
+        self.merged = False
+        self.file = None
+        self.entries = 0
+        self.compactor = None
+        self.lock = Lock()
+
+    def replay(self, data):
+        # спочатку журнал, який не встигли злити зі знімком, потім поточний
+        for entry in read_entries(self.old_path):
+            apply_entry(data, entry)
+        self.entries = 0
+        for entry in read_entries(self.path):
+            apply_entry(data, entry)
+            self.entries += 1
+        return data
+
+    def open(self):
+        self.file = open(self.path, 'ab')
+        if os.path.exists(self.old_path):
+            self.compact()
+
+    def append(self, action, name, record=None):
+        if self.file is None:
+            return
+        pickle.dump((action, name, record), self.file)
+        self.file.flush()
+        if self.sync:
+            os.fsync(self.file.fileno())
+        self.entries += 1
+        if self.entries >= self.limit:
+            self.compact()
+
+    def compact(self):
+        # злитий файл ще чекає на swap(): старий журнал потрібен до підміни
+        if self.merged:
+            return
+        if self.compactor is not None and self.compactor.is_alive():
+            return
+        if os.path.exists(self.old_path):
+            self.start_merge()
+            return
+        self.file.close()
+        os.replace(self.path, self.old_path)
+        self.file = open(self.path, 'ab')
+        self.entries = 0
+        self.start_merge()
+
+    def start_merge(self):
+        self.compactor = Thread(target=self.merge, name='journal-compactor')
+        self.compactor.start()
+
+    def merge(self):
+        with self.lock:
+            if not os.path.exists(self.old_path):
+                return
+            data = self.read(self.snapshot)
+            for entry in read_entries(self.old_path):
+                apply_entry(data, entry)
+            self.write(data)
+            if self.replace is not None:
+                self.merged = True
+                return
+            os.remove(self.old_path)
+
+    def swap(self):
+        # викликається власником книги; до підміни збій не страшний - знімок і старий журнал ще на місці
+        if not self.merged or (self.compactor is not None and self.compactor.is_alive()):
+            return False
+        self.replace()
+        os.remove(self.old_path)
+        self.merged = False
+        return True
+
+    def write_snapshot(self, data):
+        write_snapshot(self.snapshot, data)
+
+    def wait(self):
+        if self.compactor is not None:
+            self.compactor.join()
+
+    def reset(self):
+        # знімок щойно записано повністю - поточний журнал більше не потрібен
+        self.wait()
+        if self.file is not None:
+            self.file.truncate(0)
+        if os.path.exists(self.old_path):
+            os.remove(self.old_path)
+        self.merged = False
+        self.entries = 0
+
+    def exists(self):
+        return os.path.exists(self.path) or os.path.exists(self.old_path)
+
+    def remove(self):
+        self.close()
+        for path in (self.path, self.old_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def close(self):
+        self.wait()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class AutoSaver:
+    # фоновий потік, який кожні interval секунд викликає save(), тож запит команди не чекає на диск
+    def __init__(self, save, interval=AUTOSAVE_INTERVAL):
+        self.save = save
+        self.interval = interval
+        self.stopped = Event()
+        self.error = None
+        self.thread = Thread(target=self.run, name='book-autosave', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.save()
+            except OSError as error:
+                # помилка запису не зупиняє потік: зміни лишаються незбереженими до наступної спроби
+                self.error = error
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
@@ -0,0 +1,122 @@
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter_ns
+
+# заміри вмикаються змінною середовища ASSISTANT_STATS=1 або ключем --stats
+STATS_ENV = 'ASSISTANT_STATS'
+STATS_FILE = str(Path(os.path.abspath(__file__)).parent) + '//latency.json'
+# 2 ** 7 підкошиків на кожен степінь двійки: похибка значення менше 1%
+SUB_BITS = 7
+PERCENTILES = (50, 95, 99)
+SESSION = None
+
+
+class Histogram:
+    # гістограма у стилі HDR: кошик - (степінь двійки, старші SUB_BITS біт значення), пам'ять не залежить від кількості замірів
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @staticmethod
+    def bucket(value):
+        shift = max(value.bit_length() - SUB_BITS, 0)
+        return shift, value >> shift
+
+    @staticmethod
+    def bucket_value(shift, mantissa):
+        # верхня межа кошика, тож перцентиль не занижується
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value):
+        value = max(value, 0)
+        key = self.bucket(value)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, percent):
+        if not self.count:
+            return 0
+        rank = max(1, -(-self.count * percent // 100))
+        seen = 0
+        for key in sorted(self.counts):
+            seen += self.counts[key]
+            if seen >= rank:
+                return min(self.bucket_value(*key), self.max)
+        return self.max
+
+    def summary(self):
+        result = {'count': self.count, 'mean_ns': self.total // self.count if self.count else 0,
+                  'min_ns': self.min or 0, 'max_ns': self.max}
+        for percent in PERCENTILES:
+            result[f'p{percent}_ns'] = self.percentile(percent)
+        return result
+
+
+class Stats:
+    # затримки команд без часу, який користувач витратив на відповіді на запити
+    def __init__(self):
+        self.histograms = {}
+        self.waiting = 0
+
+    def ask(self, prompt=''):
+        start = perf_counter_ns()
+        try:
+            return input(prompt)
+        finally:
+            self.waiting += perf_counter_ns() - start
+
+    def record(self, name, value):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.record(value)
+
+    def time(self, name, func, *args):
+        # вкладений замір (нотатки, запущені з assistant) віддає своє очікування зовнішньому
+        outer, self.waiting = self.waiting, 0
+        start = perf_counter_ns()
+        try:
+            return func(*args)
+        finally:
+            self.record(name, perf_counter_ns() - start - self.waiting)
+            self.waiting += outer
+
+    def report(self):
+        lines = [f'{"command":<20} {"count":>7} ' + ' '.join(f'{f"p{p}, ms":>10}' for p in PERCENTILES)
+                 + f' {"max, ms":>10}']
+        for name in sorted(self.histograms):
+            summary = self.histograms[name].summary()
+            lines.append(f'{name:<20} {summary["count"]:>7} '
+                         + ' '.join(f'{summary[f"p{p}_ns"] / 1e6:>10.3f}' for p in PERCENTILES)
+                         + f' {summary["max_ns"] / 1e6:>10.3f}')
+        return '\n'.join(lines)
+
+    def dump(self, path=STATS_FILE):
+        data = {'created': datetime.now().isoformat(timespec='seconds'),
+                'commands': {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}}
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, indent=2)
+
+
+def session():
+    # одна сесія замірів на процес, спільна для assistant() і notes.main(); None - заміри вимкнені
+    global SESSION
+    if SESSION is None and (os.environ.get(STATS_ENV) or '--stats' in sys.argv):
+        SESSION = Stats()
+    return SESSION
+
+
+def timed(stats, name, func, *args):
+    # без замірів - звичайний виклик, тож вимкнені заміри майже нічого не коштують
+    if stats is None:
+        return func(*args)
+    return stats.time(name, func, *args)
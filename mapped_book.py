@@ -0,0 +1,317 @@
+import heapq
+import os
+from collections.abc import MutableMapping
+
+from contact import AddressBook, BOOK_NAME, JOURNAL_MODE, AUTOSAVE_INTERVAL
+from field_index import INDEX_KINDS
+from book_file import BookFile, is_book_file, read_raw
+from journal import Journal, read_snapshot
+
+
+class MappedRecords(MutableMapping):
+    # записи з файлу книги плюс зміни поточної сесії, які ще не записані у файл
+    def __init__(self, book, file=None):
+        self.book = book
+        self.file = file
+        self.cache = {}
+        self.changed = {}
+        self.deleted = set()
+        self.extra = set()
+        # видалені імена, яких немає у файлі: після підміни файлу злитим журналом вони можуть у ньому з'явитись
+        self.dropped = set()
+        # скільки ітераторів зараз читають файл - поки вони є, файл не підміняється
+        self.iterating = 0
+
+    def in_file(self, name):
+        return self.file is not None and name in self.file
+
+    def __getitem__(self, name):
+        if name in self.changed:
+            return self.changed[name]
+        if name in self.cache:
+            return self.cache[name]
+        if name in self.deleted or self.file is None:
+            raise KeyError(name)
+        i = self.file.find(name)
+        if i is None:
+            raise KeyError(name)
+        record = self.file.record_at(i)
+        record.book = self.book
+        self.cache[name] = record
+        return record
+
+    def __setitem__(self, name, record):
+        record.book = self.book
+        self.changed[name] = record
+        self.dropped.discard(name)
+        if name in self.deleted:
+            self.deleted.discard(name)
+        elif name not in self.extra and not self.in_file(name):
+            self.extra.add(name)
+
+    def __delitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        self.changed.pop(name, None)
+        self.cache.pop(name, None)
+        if name in self.extra:
+            self.extra.discard(name)
+            self.dropped.add(name)
+        else:
+            self.deleted.add(name)
+
+    def __contains__(self, name):
+        if name in self.changed:
+            return True
+        if name in self.deleted:
+            return False
+        return self.in_file(name)
+
+    def __len__(self):
+        return (len(self.file) if self.file is not None else 0) - len(self.deleted) + len(self.extra)
+
+    def __iter__(self):
+        # імена у порядку сортування: файл уже впорядкований, нові імена зливаємо з ним
+        self.iterating += 1
+        try:
+            names = self.file.names() if self.file is not None else ()
+            for name in heapq.merge(names, sorted(self.extra)):
+                if name not in self.deleted:
+                    yield name
+        finally:
+            self.iterating -= 1
+
+    def names_after(self, name, size):
+        # імена файлу читаються з позиції курсора, нові імена зливаються з ними
+        names = ()
+        if self.file is not None:
+            names = self.file.names(0 if name is None else self.file.position(name))
+        extra = sorted(item for item in self.extra if name is None or item > name)
+        result = []
+        for item in heapq.merge(names, extra):
+            if item in self.deleted or (name is not None and item <= name):
+                continue
+            result.append(item)
+            if len(result) >= size:
+                break
+        return result
+
+    def is_dirty(self):
+        return bool(self.changed or self.deleted)
+
+    def raw_items(self):
+        # незмінені записи копіюються з файлу як є, без розпаковування
+        self.iterating += 1
+        try:
+            if self.file is not None:
+                for name, raw in self.file.raw_items():
+                    if name not in self.deleted and name not in self.changed:
+                        yield name, raw
+        finally:
+            self.iterating -= 1
+        yield from self.changed.items()
+
+    def stream_items(self):
+        # записи з файлу розпаковуються по одному і не залишаються в кеші
+        for name in self:
+            record = self.changed.get(name) or self.cache.get(name)
+            if record is None:
+                record = self.file.record_at(self.file.find(name))
+            yield name, record
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def reopen(self, path, tmp):
+        # Windows не дає замінити файл, поки він відображений у пам'ять, тож спершу закриваємо відображення
+        self.close()
+        os.replace(tmp, path)
+        self.file = BookFile(path)
+        self.cache.update(self.changed)
+        self.changed.clear()
+        self.deleted.clear()
+        self.extra.clear()
+        self.dropped.clear()
+
+    def swap(self, path, tmp):
+        # файл, злитий з журналом у фоні, містить ті самі записи плюс частину змін сесії;
+        # облік змін перераховується лише за іменами, зміненими в сесії, без читання всієї книги
+        self.close()
+        os.replace(tmp, path)
+        self.file = BookFile(path)
+        removed = self.deleted | self.dropped
+        self.deleted = {name for name in removed if name in self.file}
+        self.dropped = removed - self.deleted
+        self.extra = {name for name in self.changed if name not in self.file}
+
+
+class LazyIndexes:
+    # індекси пошуку будуються лише при першому пошуку; книга має встановити indexed = False
+    def index_record(self, name, record):
+        if self.indexed:
+            super().index_record(name, record)
+
+    def unindex_record(self, name):
+        if self.indexed:
+            super().unindex_record(name)
+
+    def ensure_indexes(self):
+        if not self.indexed:
+            self.indexed = True
+            self.rebuild_index()
+
+    def rebuild_index(self):
+        if self.indexed:
+            super().rebuild_index()
+
+    def find_record(self, part: str):
+        self.ensure_indexes()
+        return super().find_record(part)
+
+    def find_phone(self, phone):
+        self.ensure_indexes()
+        return super().find_phone(phone)
+
+    def find_phone_prefix(self, prefix: str):
+        self.ensure_indexes()
+        return super().find_phone_prefix(prefix)
+
+    def find_phone_suffix(self, suffix: str):
+        self.ensure_indexes()
+        return super().find_phone_suffix(suffix)
+
+    def upcoming_birthdays(self, days, today=None):
+        self.ensure_indexes()
+        return super().upcoming_birthdays(days, today)
+
+    def birthdays_per_month(self):
+        self.ensure_indexes()
+        return super().birthdays_per_month()
+
+    def find_birth_month(self, month):
+        self.ensure_indexes()
+        return super().find_birth_month(month)
+
+    def add_index(self, field, kind='sorted'):
+        # до першого пошуку індекс лише оголошується, заповнить його rebuild_index
+        if self.indexed:
+            return super().add_index(field, kind)
+        self.field_indexes[field] = INDEX_KINDS[kind]()
+        return self.field_indexes[field]
+
+    def find_by(self, field, value):
+        self.ensure_indexes()
+        return super().find_by(field, value)
+
+    def find_range(self, field, low=None, high=None):
+        self.ensure_indexes()
+        return super().find_range(field, low, high)
+
+    def find_prefix(self, field, prefix):
+        self.ensure_indexes()
+        return super().find_prefix(field, prefix)
+
+
+class MappedAddressBook(LazyIndexes, AddressBook):
+    # книга у файлі з індексом зміщень: відкривається без читання всіх записів,
+    # індекси пошуку будуються лише при першому пошуку
+    def __init__(self, path=BOOK_NAME):
+        self.path = path
+        self.indexed = False
+        self.journal = None
+        self.track_changes()
+        self.create_indexes()
+        self.data = MappedRecords(self)
+
+    # у pickle потрапляє звичайна AddressBook з усіма записами
+    def __reduce__(self):
+        return AddressBook, (), {'data': dict(self.data.items())}
+
+    def record_changed(self, record):
+        name = record.get_name()
+        if name in self.data and self.data[name] is record:
+            self.data[name] = record
+            self.index_record(name, record)
+            self.log_change('set', name, record)
+
+    def log_change(self, action, name, record=None):
+        super().log_change(action, name, record)
+        # зміна книги йде з потоку, що володіє файлом (сервер тримає блокування запису),
+        # тож тут можна підмінити файл, якщо фонове злиття журналу вже завершилось
+        if self.journal is not None and not self.data.iterating:
+            self.journal.swap()
+
+    def replace_file(self):
+        self.data.swap(self.path, self.path + '.tmp')
+
+    def names_after(self, name, size):
+        return self.data.names_after(name, size)
+
+    def stream_records(self):
+        for _, record in self.data.stream_items():
+            yield record
+
+    def record_items(self):
+        # індекси будуються з записів, які не залишаються в кеші, інакше перший пошук розпакував би в пам'ять усю книгу
+        return self.data.stream_items()
+
+    def load(self, journal=JOURNAL_MODE, autosave=AUTOSAVE_INTERVAL):
+        self.data.close()
+        # старий pickle-файл при першому відкритті переписуємо у новий формат
+        if os.path.exists(self.path) and not is_book_file(self.path):
+            BookFile.write(self.path, read_snapshot(self.path).items())
+        if not os.path.exists(self.path):
+            BookFile.write(self.path, ())
+        self.data = MappedRecords(self, BookFile(self.path))
+        self.indexed = False
+        # журнал зливається з файлом книги у фоні, але відображений файл підміняє сама книга (replace_file)
+        self.journal = Journal(self.path, read=read_raw, write=self.write_merged, replace=self.replace_file)
+        self.journal.replay(self.data)
+        if journal:
+            self.journal.open()
+        else:
+            if self.journal.exists():
+                self.dump()
+                self.journal.remove()
+            self.journal = None
+        self.start_autosave(autosave)
+
+    def dump(self):
+        with self.save_lock:
+            if self.journal is not None:
+                self.journal.wait()
+            with self.dirty_lock:
+                self.dirty = {}
+            tmp = BookFile.write(self.path, self.data.raw_items(), replace=False)
+            self.data.reopen(self.path, tmp)
+            if self.journal is not None:
+                self.journal.reset()
+            return True
+
+    def write_merged(self, data):
+        # фоновий потік пише лише path.tmp: файл, який читає книга, він не чіпає
+        BookFile.write(self.path, data.items(), replace=False)
+
+    def save(self):
+        # без журналу запис перевідкриває файл книги, тож у фоні зберігаємо лише в журнал
+        if self.journal is None:
+            return False
+        return super().save()
+
+    def start_autosave(self, interval=AUTOSAVE_INTERVAL):
+        if self.journal is not None:
+            super().start_autosave(interval)
+
+    def exit(self):
+        self.stop_autosave()
+        if self.journal is not None:
+            self.save()
+            self.journal.wait()
+            self.journal.swap()
+            self.journal.close()
+            return True
+        if self.dirty or self.data.is_dirty():
+            return self.dump()
+        return True
@@ -0,0 +1,43 @@
+import base64
+from bisect import bisect_left, bisect_right
+
+
+def encode_cursor(name):
+    # курсор - останнє ім'я сторінки; клієнт бачить лише непрозорий рядок
+    return base64.urlsafe_b64encode(name.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        return base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    except (ValueError, UnicodeError):
+        raise ValueError(f'Invalid cursor: {cursor!r}') from None
+
+
+class NameIndex:
+    # впорядкований список імен: сторінка після курсора знаходиться через bisect
+    def __init__(self, names=()):
+        self.names = sorted(names)
+
+    def add(self, name):
+        i = bisect_left(self.names, name)
+        if i == len(self.names) or self.names[i] != name:
+            self.names.insert(i, name)
+
+    def discard(self, name):
+        i = bisect_left(self.names, name)
+        if i < len(self.names) and self.names[i] == name:
+            del self.names[i]
+
+    def clear(self):
+        self.names.clear()
+
+    def after(self, name, size):
+        # до size імен, більших за name (None - з початку)
+        start = 0 if name is None else bisect_right(self.names, name)
+        return self.names[start:start + size]
+
+    def __len__(self):
+        return len(self.names)
@@ -6,6 +6,8 @@ from collections import UserDict
 import json
 import copy
 
+from latency import session, timed
+
 
 
 WORK_DIR = Path(os.path.abspath(__file__)).parent
@@ -190,7 +192,7 @@ def hello():
     return "How can I help you?"
 
 
-def help():
+def help(ask=input):
     print(f'To start working with the assistant, write one of the commands[bold magenta].\nYou can use these commands[/bold magenta]\U0001F60A\n', "-" * 90)
     print(f'[bold blue]add:[/bold blue]    Adds a note to the notebook.\n', '-' * 90)
     print(f'[bold blue]search:[/bold blue]  Searches for notes in the notebook by the following fields: name / tag / status.\n', '-' * 90)
@@ -200,7 +202,7 @@ def help():
     print(f'[bold blue]del:[/bold blue]     Deleting a note, or deleting completed notes.\n', '-' * 90)
     print(f'[bold blue]cancel:[/bold blue]  An undo command anywhere in the assistant.\n', '-' * 90)
     print(f'[bold blue]good bye, close, exit:[/bold blue] Exit the program.\n', '-' * 90)
-    command = input("Press any key to return. ")
+    command = ask("Press any key to return. ")
     if command.lower() == "cancel":
         return "Exit from the help menu. "
     else:
@@ -250,40 +252,40 @@ def help():
 #     NOTES_BOOK.add_note(record)
 #     return f"Note {name.value} has been saved"
 class NoteManager:
-    def add(self):
-        name = self.get_valid_name()
+    def add(self, ask=input):
+        name = self.get_valid_name(ask)
         if name == "cancel":
             return "Adding a new note has been canceled"
-        note = self.get_valid_note(name)
+        note = self.get_valid_note(name, ask)
         if note == "cancel":
             return "Adding a new note has been canceled"
-        tag = self.get_valid_tag(name)
+        tag = self.get_valid_tag(name, ask)
         if tag == "cancel":
             return "Adding a new tag has been canceled"
         record = self.create_record(name, note, tag)
         NOTES_BOOK.add_note(record)
         return f"Note {name.value} has been saved"
 
-    def get_valid_name(self):
+    def get_valid_name(self, ask):
         while True:
-            name = input("Enter a name to your record: ")
+            name = ask("Enter a name to your record: ")
             if name == "":
                 print("Note name cannot be empty!")
             elif name.lower() == "cancel":
                 return "cancel"
             elif any(note.name == name for note in NOTES_BOOK):
-                rewrite = input("You have already such note, do you want to rewrite it? (y/n) ")
+                rewrite = ask("You have already such note, do you want to rewrite it? (y/n) ")
                 if rewrite.lower() == "y":
                     return NoteName(name)
             else:
                 return NoteName(name)
 
-    def get_valid_note(self, name):
-        note = input(f"Type {name.value}'s note: ")
+    def get_valid_note(self, name, ask):
+        note = ask(f"Type {name.value}'s note: ")
         return Notes(note) if note.lower() != "cancel" else "cancel"
 
-    def get_valid_tag(self, name):
-        tag = input(f"Type {name.value}'s tag: ")
+    def get_valid_tag(self, name, ask):
+        tag = ask(f"Type {name.value}'s tag: ")
         return Tags(tag) if tag.lower() != "cancel" else "cancel"
 
     def create_record(self, name, note, tag):
@@ -349,7 +351,7 @@ class StatusSearchStrategy:
         return notes_book.find_info_by_status(query)
 
 
-def search():
+def search(ask=input):
     strategies = {
         "name": NameSearchStrategy(),
         "tag": TagSearchStrategy(),
@@ -358,13 +360,13 @@ def search():
     context = SearchContext(strategies["name"])
 
     while True:
-        search_type = input("Choose what you want to find (name / tag / status / cancel): ").lower()
+        search_type = ask("Choose what you want to find (name / tag / status / cancel): ").lower()
         if search_type == "cancel":
             print("Searching has been canceled")
             break
 
         if search_type in strategies:
-            query = input("What you want to find: ")
+            query = ask("What you want to find: ")
             if query == "cancel":
                 print("Searching has been canceled")
                 break
@@ -377,31 +379,31 @@ def search():
                 print("Nothing matches the result")
         else:
             print("Wrong command")
-def change():
-    name = input("Which note do you want to change? ")
+def change(ask=input):
+    name = ask("Which note do you want to change? ")
     if name.lower() == "cancel":
         return "Changing has been canceled"
     if NOTES_BOOK.show_record(name):
         while True:
-            item = input(
+            item = ask(
                 f"What do you want to change at {name}'s records: (name / note / tag / status)? ")
             if item.lower() == "name":
-                new_name = input(f"Type a new name for note {name}: ")
+                new_name = ask(f"Type a new name for note {name}: ")
                 NOTES_BOOK.change_name(name, new_name)
                 return f"Name for note {name} changed to {new_name}"
             elif item.lower() == "note":
-                new_note = input(
+                new_note = ask(
                     f"Type a new text for note {name}: ")
                 if new_note.lower() == "cancel":
                     return "Changing has been canceled"
                 NOTES_BOOK.change_note(name, new_note)
                 return f"Text for note {name} changed."
             elif item.lower() == "tag":
-                command = input(
+                command = ask(
                     "Choose option: add (add one more tag) / change (replace tag to another) / dell (dell tag): ")
                 if command.lower() == "add":
                     while True:
-                        new_tag = input(
+                        new_tag = ask(
                             f"Type a new tag for note {name}: ")
                         if new_tag.lower() == "cancel":
                             return "Changing has been canceled"
@@ -411,7 +413,7 @@ def change():
                             NOTES_BOOK.add_tag(name, new_tag)
                             return f"Tag {new_tag.value} has been added"
                         else:
-                            answer = input(
+                            answer = ask(
                                 "Please, type the tag. Would you like to try one more time? (y/n): ")
                             if answer.lower() == "n":
                                 break
@@ -423,19 +425,19 @@ def change():
                                 break
                 elif command.lower() == "change":
                     while True:
-                        old_tag = input(
+                        old_tag = ask(
                             "Type tag you want to change: ")
                         if old_tag.lower() == "cancel":
                             return "Changing has been canceled"
                         if old_tag in [tag.value for tag in NOTES_BOOK.get_tags(name)]:
                             while True:
-                                new_tag = input("Type a new tag: ")
+                                new_tag = ask("Type a new tag: ")
                                 if new_tag.lower() == "cancel":
                                     return "Changing has been canceled"
                                 new_tag = Tags(new_tag)
                                 if new_tag.value == None:
                                     while True:
-                                        answer = input(
+                                        answer = ask(
                                             "Would you like try one more time? (y/n) ")
                                         if answer.lower() == "y":
                                             break
@@ -450,7 +452,7 @@ def change():
                                     return f"Tag {old_tag.value} has been changed to {new_tag.value}"
                 elif command.lower() == "dell":
                     while True:
-                        tag = input("Please type a tag you want to delete ")
+                        tag = ask("Please type a tag you want to delete ")
                         if tag == "cancel":
                             return f"You canceled changing contact {name}"
                         if NOTES_BOOK.find_info_by_tag(tag):
@@ -458,7 +460,7 @@ def change():
                             return f"Tag {tag} has been deleted"
                         else:
                             while True:
-                                answer = input(
+                                answer = ask(
                                     "Such tag didn't exist, would you like to try one more time? (y/n)")
                                 if answer.lower() in ["cancel", "n"]:
                                     return "Deleting has been canceled"
@@ -467,7 +469,7 @@ def change():
                                 else:
                                     print("Wrong command")
                 else:
-                    answer = input(
+                    answer = ask(
                         "Please, type the tag. Would you like to try one more time? (write y - it's means yes, or n - no): ")
                     if answer.lower() == "n":
                         break
@@ -479,7 +481,7 @@ def change():
                         continue
             elif item.lower() == "status":
                 while True:
-                    new_status = input(
+                    new_status = ask(
                         f"Type a new status for note {name}: (Done / In progress)? ")
                     if new_status.lower() == "cancel":
                         return "Changing has been canceled"
@@ -488,7 +490,7 @@ def change():
             elif item.lower() == "cancel":
                 return "Changing has been canceled"
             else:
-                answer = input(
+                answer = ask(
                     "You have such options: (name / note / tag / status). Would you like to try one more time? (y/n)")
                 if answer.lower() == "y":
                     continue
@@ -498,19 +500,19 @@ def change():
         return f"{name} didn't exist"
 
 
-def delete_note():
+def delete_note(ask=input):
     while True:
-        command = input("Do you want to delete one note? (write n or y) ")
+        command = ask("Do you want to delete one note? (write n or y) ")
         if command.lower() == "cancel":
             return "You have canceled deleting"
         if command.lower() == "y":
-            note = input("Which note do you want to delete? ")
+            note = ask("Which note do you want to delete? ")
             if note in NOTES_BOOK.data.keys():
                 NOTES_BOOK.data.pop(note)
                 return f"Note {note} has been deleted"
             else:
                 while True:
-                    answer = input(
+                    answer = ask(
                         "No such note, do you want to try one more time? (y/n) ")
                     if answer.lower() == "y":
                         break
@@ -520,7 +522,7 @@ def delete_note():
                         print("Wrong command")
         elif command.lower() == "n":
             while True:
-                answer = input(
+                answer = ask(
                     "Do you want to delete all completed notes? (y/n) ")
                 if answer.lower() in ["cancel"]:
                     return "You have canceled deleting"
@@ -531,7 +533,7 @@ def delete_note():
                     return "You have canceled deleting"
                 else:
                     while True:
-                        answer = input(
+                        answer = ask(
                             "No such note, do you want to try one more time? (y/n) ")
                         if answer.lower() == "y":
                             break
@@ -543,8 +545,8 @@ def delete_note():
             print("Wrong command")
 
 
-def show_note():
-    name = input("Which note do you want to see? ")
+def show_note(ask=input):
+    name = ask("Which note do you want to see? ")
     if name.lower() == "cancel":
         return "Showing has been canceled"
     if NOTES_BOOK.show_record(name):
@@ -613,7 +615,7 @@ def end_work():
 
 COMMANDS = {"hello": hello,
             "help": help,
-            "add": lambda: note_manager.add(),
+            "add": lambda ask=input: note_manager.add(ask),
             "search": search,
             "change": change,
             "show": show_all,
@@ -649,37 +651,54 @@ def main():
     print(WORK_DIR)
     print("Hello. If you need help, write 'help'")
 
-    NOTES_BOOK.deserialize()
+    stats = session()
+    timed(stats, 'notes:load', NOTES_BOOK.deserialize)
+    # час відповідей на запити команд не входить у затримку: з замірами команди питають через stats.ask
+    notes_loop(stats, stats.ask if stats is not None else input)
+
 
+def notes_loop(stats, ask=input):
     while True:
-        user_command = input(">>> ")
+        user_command = ask(">>> ")
+        if user_command.strip().lower() == "stats":
+            print(stats.report() if stats is not None else "Latency stats are off, start with --stats")
+            continue
         command = parser(user_command)
-        if command == "end_work":
-            print(COMMANDS["end_work"]())
-            NOTES_BOOK.serialize()
+        if timed(stats, f"notes:{command}", run_notes_command, command, ask):
+            timed(stats, "notes:save", NOTES_BOOK.serialize)
+            if stats is not None:
+                stats.dump()
             break
-        if command == "hello":
-            print(COMMANDS["hello"]())
-            continue
-        if command == "help":
-            print(COMMANDS["help"]())
-            continue
-        if command == "add":
-            print(COMMANDS["add"]())
-            continue
-        if command == "shownote":
-            print(COMMANDS["shownote"]())
-            continue
-        if command == "show":
-            COMMANDS["show"]()
-            continue
-        if command == "wrong_command":
-            print("Wrong command")
-            continue
-        if command == "search":
-            COMMANDS[command]()
-            continue
-        print(COMMANDS[command]())
+
+
+def run_notes_command(command, ask=input):
+    # виконує одну команду нотаток; True - робота з нотатками завершена, значення запитуються через ask
+    if command == "end_work":
+        print(COMMANDS["end_work"]())
+        return True
+    if command == "hello":
+        print(COMMANDS["hello"]())
+        return False
+    if command == "help":
+        print(COMMANDS["help"](ask))
+        return False
+    if command == "add":
+        print(COMMANDS["add"](ask))
+        return False
+    if command == "shownote":
+        print(COMMANDS["shownote"](ask))
+        return False
+    if command == "show":
+        COMMANDS["show"]()
+        return False
+    if command == "wrong_command":
+        print("Wrong command")
+        return False
+    if command == "search":
+        COMMANDS[command](ask)
+        return False
+    print(COMMANDS[command](ask))
+    return False
 
 
 if __name__ == "__main__":
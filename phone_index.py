@@ -0,0 +1,117 @@
+OWNERS = ''
+
+
+def phone_digits(phone):
+    return ''.join(ch for ch in str(phone) if ch.isdigit())
+
+
+def prefix_digits(prefix):
+    # локальний код оператора (067...) доповнюємо до формату Phone.validate_phone (+38067...)
+    digits = phone_digits(prefix)
+    if digits.startswith('0'):
+        digits = '38' + digits
+    return digits
+
+
+class DigitTrie:
+    # вузол - словник {цифра: дочірній вузол}, під ключем '' зберігаються власники номера
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, digits, key):
+        node = self.root
+        for digit in digits:
+            node = node.setdefault(digit, {})
+        node.setdefault(OWNERS, set()).add(key)
+
+    def remove(self, digits, key):
+        path = [self.root]
+        node = self.root
+        for digit in digits:
+            node = node.get(digit)
+            if node is None:
+                return
+            path.append(node)
+        owners = node.get(OWNERS)
+        if not owners:
+            return
+        owners.discard(key)
+        if not owners:
+            del node[OWNERS]
+        # прибираємо порожні гілки
+        for i in range(len(digits), 0, -1):
+            if path[i]:
+                break
+            del path[i - 1][digits[i - 1]]
+
+    def find(self, digits):
+        node = self.root
+        for digit in digits:
+            node = node.get(digit)
+            if node is None:
+                return None
+        return node
+
+    def exact(self, digits):
+        node = self.find(digits)
+        if node is None:
+            return set()
+        return set(node.get(OWNERS, ()))
+
+    def collect(self, digits):
+        node = self.find(digits)
+        result = set()
+        if node is None:
+            return result
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for digit, child in node.items():
+                if digit == OWNERS:
+                    result |= child
+                else:
+                    stack.append(child)
+        return result
+
+
+class PhoneIndex:
+    # індекс нормалізованих номерів: пряме дерево для "починається з", обернене - для "закінчується на"
+    def __init__(self):
+        self.prefixes = DigitTrie()
+        self.suffixes = DigitTrie()
+        self.phones = {}
+
+    def add(self, key, phones):
+        self.discard(key)
+        digits = tuple({phone_digits(phone) for phone in phones if phone})
+        if not digits:
+            return
+        self.phones[key] = digits
+        for number in digits:
+            self.prefixes.insert(number, key)
+            self.suffixes.insert(number[::-1], key)
+
+    def discard(self, key):
+        for number in self.phones.pop(key, ()):
+            self.prefixes.remove(number, key)
+            self.suffixes.remove(number[::-1], key)
+
+    def clear(self):
+        self.prefixes = DigitTrie()
+        self.suffixes = DigitTrie()
+        self.phones.clear()
+
+    def owners(self, phone):
+        return self.prefixes.exact(phone_digits(phone))
+
+    # запит без жодної цифри нічого не знаходить, а не повертає всю книгу
+    def starts_with(self, prefix):
+        digits = prefix_digits(prefix)
+        return self.prefixes.collect(digits) if digits else set()
+
+    def ends_with(self, suffix):
+        digits = phone_digits(suffix)
+        return self.suffixes.collect(digits[::-1]) if digits else set()
+
+    def __len__(self):
+        return len(self.phones)
@@ -0,0 +1,96 @@
+from collections import defaultdict
+
+# скільки запитів, коротших за n-граму, тримати готовими; решта виводиться з n-грам заново
+SHORT_CACHE = 64
+
+
+class NGramIndex:
+    # інвертований індекс n-грам: n-грама -> множина ключів записів
+    def __init__(self, n=3):
+        self.n = n
+        self.postings = defaultdict(set)
+        self.texts = {}
+        # короткий запит -> ключі, виведені з n-грам, що його містять; ключі з текстами, коротшими за n-граму
+        self.short = {}
+        self.tiny = set()
+
+    def grams(self, text):
+        n = self.n
+        return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+    def all_grams(self, texts):
+        result = set()
+        n = self.n
+        for text in texts:
+            result.update(text[i:i + n] for i in range(len(text) - n + 1))
+        return result
+
+    def add(self, key, texts):
+        self.discard(key)
+        texts = tuple(text.lower() for text in texts if text)
+        self.texts[key] = texts
+        for gram in self.all_grams(texts):
+            self.postings[gram].add(key)
+        if any(len(text) < self.n for text in texts):
+            self.tiny.add(key)
+        for part, keys in self.short.items():
+            if any(part in text for text in texts):
+                keys.add(key)
+
+    def discard(self, key):
+        texts = self.texts.pop(key, None)
+        if texts is None:
+            return
+        self.tiny.discard(key)
+        for keys in self.short.values():
+            keys.discard(key)
+        for gram in self.all_grams(texts):
+            keys = self.postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.postings[gram]
+
+    def clear(self):
+        self.postings.clear()
+        self.texts.clear()
+        self.short.clear()
+        self.tiny.clear()
+
+    def short_candidates(self, part):
+        # кожне входження короткого запиту в текст довжиною від n лежить всередині якоїсь n-грами
+        keys = self.short.pop(part, None)
+        if keys is None:
+            keys = set()
+            for gram, gram_keys in self.postings.items():
+                if part in gram:
+                    keys |= gram_keys
+            keys.update(key for key in self.tiny if any(part in text for text in self.texts[key]))
+            if len(self.short) >= SHORT_CACHE:
+                del self.short[next(iter(self.short))]
+        # останній запит - у кінці словника, тож першим витісняється найдавніший
+        self.short[part] = keys
+        return set(keys)
+
+    def candidates(self, part):
+        part = part.lower()
+        if not part:
+            return set(self.texts)
+        if len(part) < self.n:
+            return self.short_candidates(part)
+        postings = []
+        for gram in self.grams(part):
+            keys = self.postings.get(gram)
+            if not keys:
+                return set()
+            postings.append(keys)
+        postings.sort(key=len)
+        result = set(postings[0])
+        for keys in postings[1:]:
+            result &= keys
+            if not result:
+                break
+        return result
+
+    def __len__(self):
+        return len(self.texts)
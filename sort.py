@@ -62,6 +62,15 @@ EXTENSIONS = set()
 UNKNOWN = set()
 
 
+def reset():
+    # знайдені файли накопичуються в глобальних списках, тож перед новим запуском їх очищаємо
+    for files in REGISTER_EXTENSION.values():
+        files.clear()
+    FOLDERS.clear()
+    EXTENSIONS.clear()
+    UNKNOWN.clear()
+
+
 def get_extension(name: str) -> str:
     return Path(name).suffix[1:].upper()
 
@@ -0,0 +1,391 @@
+import os
+import pickle
+import sqlite3
+from collections.abc import MutableMapping
+from datetime import date
+
+from contact import AddressBook, Phone, BOOK_NAME, WORK_DIR
+from birthday_index import BirthdayIndex
+from field_index import field_values, normalize_value, prefix_end
+from journal import Journal, read_snapshot
+from phone_index import phone_digits, prefix_digits
+
+SQLITE_BOOK_NAME = str(WORK_DIR) + '//my_book.db'
+# PRAGMA user_version бази; 1 - місто зберігається нормалізованим, як у field_index,
+# 2 - додано нормалізоване ім'я та повну дату народження для пошуку за префіксом і діапазоном
+SCHEMA_VERSION = 2
+# поля запису, чиї нормалізовані значення лежать в окремих колонках з індексом
+SQL_FIELDS = {'name': 'name_key', 'birthday': 'birthday', 'city': 'city'}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS contacts (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    record BLOB NOT NULL,
+    birthday_month INTEGER,
+    birthday_day INTEGER,
+    birthday TEXT,
+    name_key TEXT,
+    city TEXT,
+    search TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS contacts_birthday ON contacts (birthday_month, birthday_day);
+CREATE INDEX IF NOT EXISTS contacts_city ON contacts (city);
+CREATE TABLE IF NOT EXISTS phones (
+    contact_id INTEGER NOT NULL REFERENCES contacts (id) ON DELETE CASCADE,
+    phone TEXT NOT NULL,
+    reversed TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS phones_phone ON phones (phone);
+CREATE INDEX IF NOT EXISTS phones_reversed ON phones (reversed);
+CREATE INDEX IF NOT EXISTS phones_contact ON phones (contact_id);
+CREATE TABLE IF NOT EXISTS emails (
+    contact_id INTEGER NOT NULL REFERENCES contacts (id) ON DELETE CASCADE,
+    email TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS emails_email ON emails (email);
+CREATE INDEX IF NOT EXISTS emails_contact ON emails (contact_id);
+'''
+
+# індекси колонок, яких не було в базах першої версії: створюються після migrate()
+FIELD_INDEXES = '''
+CREATE INDEX IF NOT EXISTS contacts_name_key ON contacts (name_key);
+CREATE INDEX IF NOT EXISTS contacts_birthday_date ON contacts (birthday);
+'''
+
+# повнотекстовий індекс триграм для пошуку підрядка, якщо SQLite його підтримує
+SEARCH_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS contacts_search USING fts5(search, tokenize='trigram case_sensitive 1')"
+
+
+def record_city(name, record):
+    # те саме значення, що й у індексі city звичайної книги: адреса рядком вважається містом
+    cities = field_values('city', name, record)
+    return cities[0] if cities else None
+
+
+def sql_value(value):
+    # дати в базі зберігаються рядками yyyy-mm-dd, тож порівнюються так само, як date
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def field_columns(name, record):
+    # (name_key, birthday, city) - ті самі значення, що й в індексах полів звичайної книги
+    birthday = record.birthday_date()
+    return normalize_value(name), birthday.isoformat() if birthday else None, record_city(name, record)
+
+
+def digits_range(digits):
+    # усі номери з префіксом digits лежать у проміжку [digits, digits + ':'), бо ':' йде одразу після '9'
+    return digits, digits + ':'
+
+
+class RecordTable(MutableMapping):
+    # словник записів поверх таблиці contacts: записи розпаковуються лише при зверненні
+    def __init__(self, book, connection):
+        self.book = book
+        self.connection = connection
+        self.cache = {}
+        try:
+            connection.execute(SEARCH_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False
+
+    def attach(self, name, blob):
+        record = self.cache.get(name)
+        if record is None:
+            record = pickle.loads(blob)
+            record.book = self.book
+            self.cache[name] = record
+        return record
+
+    def __getitem__(self, name):
+        if name in self.cache:
+            return self.cache[name]
+        row = self.connection.execute('SELECT record FROM contacts WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return self.attach(name, row[0])
+
+    def __setitem__(self, name, record):
+        self.cache[name] = record
+        with self.connection:
+            self.save(name, record)
+
+    def __delitem__(self, name):
+        row = self.connection.execute('SELECT id FROM contacts WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        with self.connection:
+            self.connection.execute('DELETE FROM contacts WHERE id = ?', row)
+            if self.fts:
+                self.connection.execute('DELETE FROM contacts_search WHERE rowid = ?', row)
+        record = self.cache.pop(name, None)
+        if record is not None:
+            record.book = None
+
+    def __contains__(self, name):
+        if name in self.cache:
+            return True
+        return self.connection.execute('SELECT 1 FROM contacts WHERE name = ?', (name,)).fetchone() is not None
+
+    def __iter__(self):
+        for row in self.connection.execute('SELECT name FROM contacts ORDER BY id'):
+            yield row[0]
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM contacts').fetchone()[0]
+
+    def items(self):
+        # один запит замість окремого SELECT на кожен запис
+        for name, blob in self.connection.execute('SELECT name, record FROM contacts ORDER BY id'):
+            yield name, self.attach(name, blob)
+
+    def values(self):
+        for name, record in self.items():
+            yield record
+
+    def select(self, sql, params=()):
+        return {name: self[name] for name, in self.connection.execute(sql, params).fetchall()}
+
+    def save(self, name, record):
+        birthday = record.birthday_date()
+        name_key, birthday_text, city = field_columns(name, record)
+        search = '\n'.join([name.lower(), *record.phones, *record.emails]).lower()
+        blob = pickle.dumps(record)
+        contact_id = self.connection.execute(
+            'INSERT INTO contacts (name, record, birthday_month, birthday_day, birthday, name_key, city, search) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (name) DO UPDATE SET record = excluded.record, birthday_month = excluded.birthday_month, '
+            'birthday_day = excluded.birthday_day, birthday = excluded.birthday, name_key = excluded.name_key, '
+            'city = excluded.city, search = excluded.search '
+            'RETURNING id',
+            (name, blob, birthday.month if birthday else None, birthday.day if birthday else None, birthday_text,
+             name_key, city, search)
+        ).fetchone()[0]
+        self.connection.execute('DELETE FROM phones WHERE contact_id = ?', (contact_id,))
+        self.connection.executemany(
+            'INSERT INTO phones (contact_id, phone, reversed) VALUES (?, ?, ?)',
+            [(contact_id, digits, digits[::-1]) for digits in {phone_digits(phone) for phone in record.phones if phone}])
+        self.connection.execute('DELETE FROM emails WHERE contact_id = ?', (contact_id,))
+        self.connection.executemany(
+            'INSERT INTO emails (contact_id, email) VALUES (?, ?)',
+            [(contact_id, email.lower()) for email in set(record.emails)])
+        if self.fts:
+            self.connection.execute('DELETE FROM contacts_search WHERE rowid = ?', (contact_id,))
+            self.connection.execute('INSERT INTO contacts_search (rowid, search) VALUES (?, ?)', (contact_id, search))
+
+
+class SQLiteAddressBook(AddressBook):
+    # книга контактів у базі SQLite: той самий інтерфейс, що й AddressBook, пошук через індекси бази
+    def __init__(self, path=SQLITE_BOOK_NAME):
+        self.path = path
+        self.journal = None
+        # dirty лишається порожнім: кожна зміна одразу записується в базу, фонове збереження не потрібне
+        self.track_changes()
+        # з'єднання спільне для потоків сервера книги (book_server.py), SQLite сам їх серіалізує
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.executescript(SCHEMA)
+        self.migrate()
+        self.connection.executescript(FIELD_INDEXES)
+        self.data = RecordTable(self, self.connection)
+        self.fuzzy_index = None
+        # поля без індексу в базі шукаються перебором (AddressBook.scan_field)
+        self.field_indexes = {}
+
+    def migrate(self):
+        version, = self.connection.execute('PRAGMA user_version').fetchone()
+        if version >= SCHEMA_VERSION:
+            return
+        columns = {row[1] for row in self.connection.execute('PRAGMA table_info(contacts)')}
+        with self.connection:
+            for column in ('birthday', 'name_key'):
+                if column not in columns:
+                    self.connection.execute(f'ALTER TABLE contacts ADD COLUMN {column} TEXT')
+            # нові колонки і міста, записані до нормалізації, перераховуються з самих записів
+            rows = self.connection.execute('SELECT id, name, record FROM contacts')
+            self.connection.executemany('UPDATE contacts SET name_key = ?, birthday = ?, city = ? WHERE id = ?',
+                                        ((*field_columns(name, pickle.loads(blob)), contact_id)
+                                         for contact_id, name, blob in rows))
+            self.connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def __setitem__(self, name, record):
+        record.book = self
+        self.data[name] = record
+        self.fuzzy_add(name)
+
+    def __delitem__(self, name):
+        del self.data[name]
+        self.fuzzy_discard(name)
+
+    def __getstate__(self):
+        raise TypeError('SQLiteAddressBook is stored in its database and cannot be pickled')
+
+    def create_indexes(self):
+        pass
+
+    def add_index(self, field, kind='sorted'):
+        raise TypeError('SQLiteAddressBook uses the indexes of its database')
+
+    def rebuild_index(self):
+        pass
+
+    def record_changed(self, record):
+        name = record.get_name()
+        if self.data.cache.get(name) is record:
+            self.data[name] = record
+
+    def add_records(self, records):
+        # одна транзакція на все додавання
+        count = 0
+        with self.connection:
+            for record in records:
+                name = record.get_name()
+                record.book = self
+                self.data.cache[name] = record
+                self.data.save(name, record)
+                self.fuzzy_add(name)
+                count += 1
+        return count
+
+    def names_after(self, name, size):
+        # індекс UNIQUE по name: сторінка - це пошук по індексу, а не перебір таблиці
+        if name is None:
+            rows = self.connection.execute('SELECT name FROM contacts ORDER BY name LIMIT ?', (size,))
+        else:
+            rows = self.connection.execute('SELECT name FROM contacts WHERE name > ? ORDER BY name LIMIT ?',
+                                           (name, size))
+        return [row[0] for row in rows]
+
+    def stream_records(self):
+        for name, blob in self.connection.execute('SELECT name, record FROM contacts ORDER BY id'):
+            record = self.data.cache.get(name)
+            yield record if record is not None else pickle.loads(blob)
+
+    def find_record(self, part: str):
+        text = part.lower()
+        if self.data.fts and len(text) >= 3:
+            candidates = self.data.select(
+                'SELECT c.name FROM contacts_search s JOIN contacts c ON c.id = s.rowid WHERE contacts_search MATCH ? '
+                'ORDER BY c.name',
+                ('"' + text.replace('"', '""') + '"',))
+        else:
+            candidates = self.data.select('SELECT name FROM contacts WHERE instr(search, ?) > 0 ORDER BY name', (text,))
+        return {name: record for name, record in candidates.items() if self.match_record(part, name, record)}
+
+    def find_phone(self, phone):
+        return self.data.select(
+            'SELECT DISTINCT c.name FROM phones p JOIN contacts c ON c.id = p.contact_id WHERE p.phone = ? '
+            'ORDER BY c.name',
+            (phone_digits(Phone(phone).value_of()),))
+
+    def find_phone_prefix(self, prefix: str):
+        digits = prefix_digits(prefix)
+        if not digits:
+            return {}
+        return self.data.select(
+            'SELECT DISTINCT c.name FROM phones p JOIN contacts c ON c.id = p.contact_id '
+            'WHERE p.phone >= ? AND p.phone < ? ORDER BY c.name', digits_range(digits))
+
+    def find_phone_suffix(self, suffix: str):
+        digits = phone_digits(suffix)
+        if not digits:
+            return {}
+        return self.data.select(
+            'SELECT DISTINCT c.name FROM phones p JOIN contacts c ON c.id = p.contact_id '
+            'WHERE p.reversed >= ? AND p.reversed < ? ORDER BY c.name', digits_range(digits[::-1]))
+
+    def find_by(self, field, value):
+        if field == 'city':
+            return self.find_city(value)
+        if field == 'email':
+            return self.find_email(value)
+        if field == 'phone':
+            return self.find_phone(value)
+        column = SQL_FIELDS.get(field)
+        if column is None:
+            return super().find_by(field, value)
+        return self.data.select(f'SELECT name FROM contacts WHERE {column} = ? ORDER BY name',
+                                (sql_value(normalize_value(value)),))
+
+    # пошук за префіксом і діапазоном - через індекси колонок, без розпаковування всіх записів (scan_field)
+    def find_range(self, field, low=None, high=None):
+        column = SQL_FIELDS.get(field)
+        if column is None:
+            return super().find_range(field, low, high)
+        conditions, params = [f'{column} IS NOT NULL'], []
+        low, high = normalize_value(low), normalize_value(high)
+        if low is not None:
+            conditions.append(f'{column} >= ?')
+            params.append(sql_value(low))
+        if high is not None:
+            conditions.append(f'{column} <= ?')
+            params.append(sql_value(high))
+        return self.data.select(
+            f'SELECT name FROM contacts WHERE {" AND ".join(conditions)} ORDER BY {column}, name', params)
+
+    def find_prefix(self, field, prefix):
+        column = SQL_FIELDS.get(field)
+        if column is None:
+            return super().find_prefix(field, prefix)
+        prefix = normalize_value(prefix) or ''
+        if not prefix:
+            return self.data.select(f'SELECT name FROM contacts WHERE {column} IS NOT NULL ORDER BY {column}, name')
+        return self.data.select(
+            f'SELECT name FROM contacts WHERE {column} >= ? AND {column} < ? ORDER BY {column}, name',
+            (prefix, prefix_end(prefix)))
+
+    def find_email(self, email: str):
+        return self.data.select(
+            'SELECT DISTINCT c.name FROM emails e JOIN contacts c ON c.id = e.contact_id WHERE e.email = ?',
+            (email.lower(),))
+
+    def find_city(self, city: str):
+        # у базі місто нормалізоване, тож регістр і пробіли по краях не важливі
+        return self.data.select('SELECT name FROM contacts WHERE city = ? ORDER BY name', (normalize_value(city),))
+
+    def upcoming_birthdays(self, days: int, today: date = None):
+        today = today or date.today()
+        result = []
+        for year, low, high in BirthdayIndex.ranges(today, BirthdayIndex.window(days, today)):
+            rows = self.connection.execute(
+                'SELECT name, birthday_month, birthday_day FROM contacts '
+                'WHERE (birthday_month, birthday_day) BETWEEN (?, ?) AND (?, ?) '
+                'ORDER BY birthday_month, birthday_day, name', (*low, *high)).fetchall()
+            for name, month, day in rows:
+                when = BirthdayIndex.occurrence(year, month, day)
+                result.append((self.data[name], (when - today).days))
+        return result
+
+    def find_birth_month(self, month):
+        return self.data.select(
+            'SELECT name FROM contacts WHERE birthday_month = ? ORDER BY birthday_day, name', (month,))
+
+    def birthdays_per_month(self):
+        counts = [0] * 12
+        for month, count in self.connection.execute(
+                'SELECT birthday_month, COUNT(*) FROM contacts WHERE birthday_month IS NOT NULL GROUP BY birthday_month'):
+            counts[month - 1] = count
+        return counts
+
+    def dump(self):
+        self.connection.commit()
+        return True
+
+    def load(self, book_name=BOOK_NAME):
+        # при першому відкритті переносимо записи зі старої книги my_book.bin
+        if len(self.data) or not os.path.exists(book_name):
+            return
+        data = read_snapshot(book_name)
+        Journal(book_name).replay(data)
+        with self.connection:
+            for name, record in data.items():
+                self.data.save(name, record)
+
+    def exit(self):
+        self.dump()
+        self.connection.close()
+        return True
@@ -0,0 +1,42 @@
+import os
+from pathlib import Path
+
+# команди, яким не потрібна книга контактів; sort і notes (з rich) імпортуються лише при першому виклику
+
+
+def scan_folder(my_book, ask):
+    folder = ask('Input folder name for scaning: ')
+    if not os.path.exists(folder):
+        print('Folder not found')
+        return False
+    import sort
+    sort.reset()
+    sort.scan(Path(folder))
+    print(f'Known extensions: {", ".join(sorted(sort.EXTENSIONS)) or "-"}')
+    print(f'Unknown extensions: {", ".join(sorted(sort.UNKNOWN)) or "-"}')
+    return True
+
+
+def sort_folder(my_book, ask):
+    folder = ask('Input folder name for sorting: ')
+    if not os.path.exists(folder):
+        print('Error sorting files')
+        return False
+    import sort
+    sort.reset()
+    sort.main(Path(folder))
+    return True
+
+
+def notes(my_book, ask):
+    import notes
+    notes.note_manager = notes.NoteManager()
+    notes.main()
+    return False
+
+
+def stats(my_book, ask):
+    from latency import session
+    current = session()
+    print(current.report() if current is not None else 'Latency stats are off, start with --stats')
+    return False